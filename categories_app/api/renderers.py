@@ -0,0 +1,26 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON, one JSON document per line.
+    Selected by `Accept: application/x-ndjson` or ?format=ndjson.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(render_json(row) + b"\n" for row in rows)
+
+
+def render_json(data) -> bytes:
+    """
+    Renders data exactly as the JSON responses of the API are rendered.
+    """
+    return JSONRenderer().render(data)
@@ -1,5 +1,12 @@
+from itertools import groupby
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
 from rest_framework import serializers
 from categories_app.models import Category
+from categories_app.lib.category_tree import CategoryTree
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -25,9 +32,9 @@ class CategorySerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         instance = self.instance
-        new_parent = attrs.get("parent", instance.parent if instance else None)
+        new_parent = attrs.get("parent")
 
-        if instance and new_parent and new_parent != instance.parent:
+        if instance and new_parent and new_parent.pk != instance.parent_id:
             if instance.pk == new_parent.pk:
                 raise serializers.ValidationError(
                     "A category cannot be its own parent."
@@ -43,19 +50,439 @@ class CategorySerializer(serializers.ModelSerializer):
 
     def _is_descendant(self, category, potential_descendant) -> bool:
         """
-        Recursively checks if `potential_descendant` is a descendant of `category`.
+        Checks if `potential_descendant` is a descendant of `category`,
+        by their materialized paths read from the db in one query, however deep they are.
+
+        Within a transaction the two rows are locked until it ends,
+        so a concurrent move of either one can not create a cycle between the check and the save.
         """
         if potential_descendant is None:
             return False
 
-        # Walk up the tree from the potential descendant
-        current = potential_descendant
-        while current:
-            if current.pk == category.pk:
-                return True
-            current = current.parent
-        return False
+        queryset = Category.objects.filter(
+            pk__in=[category.pk, potential_descendant.pk]
+        ).order_by("pk")
+        if transaction.get_connection().in_atomic_block:
+            queryset = queryset.select_for_update()
+
+        paths = dict(queryset.values_list("pk", "path"))
+        return paths.get(potential_descendant.pk, "").startswith(paths[category.pk])
+
+
+class CategoryReadSerializer:
+    """
+    Read-only fast path for category listings, with output identical to CategorySerializer.
+
+    Builds the output dicts straight from values() rows, plus the similar_to ids
+    of all the rows read from the through table in one query,
+    instead of serializing model instances field by field.
+
+    Optionally limited to a subset of `fields` (always in the order of CategorySerializer),
+    then only those columns are selected, and similar_to is not queried unless requested.
+    """
+
+    all_fields: list[str] = CategorySerializer.Meta.fields
+    value_fields: list[str] = [field for field in all_fields if field != "similar_to"]
+    datetime_fields: set[str] = {"created_at", "updated_at"}
+
+    def __init__(self, rows: list[dict], fields: Iterable[str] | None = None):
+        self.rows = rows
+        self.fields = self._ordered(fields)
+
+    @classmethod
+    def values(
+        cls,
+        queryset: QuerySet[Category],
+        fields: Iterable[str] | None = None,
+        extra_fields: Iterable[str] = (),
+    ) -> QuerySet:
+        """
+        values() of the columns needed for `fields`, plus `extra_fields` (e.g. for ordering).
+        The id is always selected, it is needed to look up similar_to and for pagination.
+        """
+        needed = {"id", *cls._ordered(fields), *extra_fields}
+        return queryset.values(
+            *(field for field in cls.value_fields if field in needed)
+        )
+
+    @classmethod
+    def _ordered(cls, fields: Iterable[str] | None) -> list[str]:
+        if fields is None:
+            return cls.all_fields
+
+        fields = set(fields)
+        return [field for field in cls.all_fields if field in fields]
+
+    @property
+    def data(self) -> list[dict]:
+        similar_to: dict[int, list[int]] = {}
+        if "similar_to" in self.fields:
+            similar_to = self._similar_to_ids([row["id"] for row in self.rows])
+        # Resolving the current timezone once, rather than per value, is most of the speedup.
+        datetime_to_representation = serializers.DateTimeField(
+            default_timezone=timezone.get_current_timezone()
+        ).to_representation
+
+        if self.fields == self.all_fields:
+            return [
+                {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "description": row["description"],
+                    "parent": row["parent"],
+                    "similar_to": similar_to.get(row["id"], []),
+                    "created_at": datetime_to_representation(row["created_at"]),
+                    "updated_at": datetime_to_representation(row["updated_at"]),
+                }
+                for row in self.rows
+            ]
+
+        def represent(row: dict, field: str):
+            if field == "similar_to":
+                return similar_to.get(row["id"], [])
+            if field in self.datetime_fields:
+                return datetime_to_representation(row[field])
+            return row[field]
+
+        return [
+            {field: represent(row, field) for field in self.fields} for row in self.rows
+        ]
+
+    def _similar_to_ids(self, ids: list[int]) -> dict[int, list[int]]:
+        similar_to: dict[int, list[int]] = {}
+        if not ids:
+            return similar_to
+
+        pairs = (
+            Category.similar_to.through.objects.filter(from_category_id__in=ids)
+            .order_by("to_category_id")
+            .values_list("from_category_id", "to_category_id")
+        )
+        for from_id, to_id in pairs:
+            similar_to.setdefault(from_id, []).append(to_id)
+
+        return similar_to
+
+
+class CategoryBulkItemSerializer(serializers.Serializer):
+    """
+    A category to create (without id) or update (with id) in a bulk write.
+    The parent is either an existing category (parent) or a new one in the same batch (parent_ref),
+    referenced by its ref.
+    """
+
+    id = serializers.IntegerField(required=False, min_value=1)
+    ref = serializers.CharField(required=False, max_length=50)
+    name = serializers.CharField(required=False, max_length=50)
+    description = serializers.CharField(
+        required=False, allow_null=True, allow_blank=True, max_length=300
+    )
+    parent = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    parent_ref = serializers.CharField(required=False, max_length=50)
+
+    def validate(self, attrs):
+        if "id" in attrs and "ref" in attrs:
+            raise serializers.ValidationError("Only new categories can have a ref.")
+
+        if "id" not in attrs and "name" not in attrs:
+            raise serializers.ValidationError("New categories must have a name.")
+
+        if "parent" in attrs and "parent_ref" in attrs:
+            raise serializers.ValidationError("Set either parent or parent_ref.")
+
+        return attrs
+
+
+class CategoryBulkSerializer(serializers.Serializer):
+    """
+    Creates and updates a batch of categories in one transaction.
+
+    The whole batch is validated against one in-memory CategoryTree of the resulting parents,
+    then written with one bulk_create per tree level of the new categories and one bulk_update,
+    plus one bulk_update of the paths of the new categories and of the moved subtrees.
+    """
+
+    max_batch_size = 10_000
+
+    categories = CategoryBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_categories(self, items: list[dict]) -> list[dict]:
+        if len(items) > self.max_batch_size:
+            raise serializers.ValidationError(
+                f"At most {self.max_batch_size} categories per batch."
+            )
+
+        ids = [item["id"] for item in items if "id" in item]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each id can be used once per batch.")
+
+        refs = [item["ref"] for item in items if "ref" in item]
+        if len(refs) != len(set(refs)):
+            raise serializers.ValidationError("Each ref can be used once per batch.")
+
+        unknown_refs = {item["parent_ref"] for item in items if "parent_ref" in item}
+        unknown_refs -= set(refs)
+        if unknown_refs:
+            raise serializers.ValidationError(
+                f"Unknown parent_ref: {', '.join(sorted(unknown_refs))}"
+            )
+
+        return items
+
+    def validate(self, attrs):
+        items = attrs["categories"]
+        self._build_tree(items)
+        return attrs
+
+    def _build_tree(self, items: list[dict]) -> None:
+        """
+        Sets self.tree, the CategoryTree of the parents after the batch,
+        and self.parent_ids, the parent ids it is built from.
+        New categories get the placeholder id -1 - (index in the batch) until they are inserted.
+        """
+        self.parent_ids = dict(Category.objects.values_list("id", "parent_id"))
+
+        unknown_ids = {
+            id
+            for item in items
+            for id in (item.get("id"), item.get("parent"))
+            if id is not None and id not in self.parent_ids
+        }
+        if unknown_ids:
+            raise serializers.ValidationError(
+                f"Unknown categories: {', '.join(map(str, sorted(unknown_ids)))}"
+            )
+
+        refs = {item["ref"]: i for i, item in enumerate(items) if "ref" in item}
+        for i, item in enumerate(items):
+            id = item.get("id", -1 - i)
+            if "parent" in item:
+                self.parent_ids[id] = item["parent"]
+            elif "parent_ref" in item:
+                self.parent_ids[id] = -1 - refs[item["parent_ref"]]
+            elif "id" not in item:
+                self.parent_ids[id] = None
+
+        try:
+            self.tree = CategoryTree(self.parent_ids.items())
+        except ValueError:
+            raise serializers.ValidationError(
+                "Cannot set these parents (would create a cycle)."
+            )
+
+    @staticmethod
+    def _moved_ids(items: list[dict]) -> list[int]:
+        """
+        (Placeholder) ids of the new and reparented categories of the batch.
+        """
+        return [
+            item.get("id", -1 - i)
+            for i, item in enumerate(items)
+            if "id" not in item or "parent" in item or "parent_ref" in item
+        ]
+
+    @transaction.atomic
+    def create(self, validated_data) -> list[int]:
+        """
+        Writes the batch, returns the ids of its categories in the order of the batch.
+        """
+        items = validated_data["categories"]
+        ids = [item.get("id") for item in items]
+
+        # Lock the reparented categories and their new parents, as CategorySerializer does on a move,
+        # and validate the parents again as committed by now,
+        # so a write that overlapped validate() cannot make the batch commit a cycle.
+        locked_ids = {
+            id
+            for item in items
+            if "parent" in item or "parent_ref" in item
+            for id in (item.get("id"), item.get("parent"))
+            if id is not None
+        }
+        list(
+            Category.objects.filter(pk__in=locked_ids)
+            .order_by("pk")
+            .select_for_update()
+            .values_list("pk", flat=True)
+        )
+        try:
+            self._build_tree(items)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError(serializers.as_serializer_error(exc))
+
+        # Insert the new categories top-down, so the ids of new parents are known.
+        new_items = sorted(
+            (i for i, item in enumerate(items) if "id" not in item),
+            key=lambda i: self.tree.depth(-1 - i),
+        )
+        real_ids: dict[int, int] = {}
+        for _, level in groupby(new_items, key=lambda i: self.tree.depth(-1 - i)):
+            level = list(level)
+            categories = Category.objects.bulk_create(
+                Category(
+                    name=items[i]["name"],
+                    description=items[i].get("description"),
+                    parent_id=self._resolve(self.parent_ids[-1 - i], real_ids),
+                )
+                for i in level
+            )
+            for i, category in zip(level, categories):
+                ids[i] = real_ids[-1 - i] = category.id
+
+        updated_items = [item for item in items if "id" in item]
+        if updated_items:
+            categories = Category.objects.in_bulk(
+                [item["id"] for item in updated_items]
+            )
+            fields = {"updated_at"}
+            now = timezone.now()
+            for item in updated_items:
+                category = categories[item["id"]]
+                for field in ("name", "description"):
+                    if field in item:
+                        setattr(category, field, item[field])
+                        fields.add(field)
+                if "parent" in item or "parent_ref" in item:
+                    category.parent_id = self._resolve(
+                        self.parent_ids[category.id], real_ids
+                    )
+                    fields.add("parent")
+                category.updated_at = now
+
+            Category.objects.bulk_update(
+                categories.values(), sorted(fields), batch_size=1000
+            )
+
+        self._write_paths(self._moved_ids(items), real_ids)
+        return ids
+
+    def _write_paths(self, category_ids: list[int], real_ids: dict[int, int]) -> None:
+        """
+        Writes the materialized paths and depths of the subtrees of the categories, from self.tree.
+        """
+        paths: dict[int, str] = {}
+        for category_id in category_ids:
+            # Pre-order, so a parent's path is always known before its children's.
+            for id in self.tree.descendants(category_id):
+                if id in paths:
+                    continue
+
+                parent_id = self.tree.parent_id(id)
+                if parent_id is None:
+                    parent_path = ""
+                elif parent_id in paths:
+                    parent_path = paths[parent_id]
+                else:
+                    parent_path = "".join(
+                        f"{self._resolve(ancestor_id, real_ids)}/"
+                        for ancestor_id in self.tree.ancestors(parent_id)
+                    )
+                paths[id] = f"{parent_path}{self._resolve(id, real_ids)}/"
+
+        Category.objects.bulk_update(
+            [
+                Category(
+                    id=self._resolve(id, real_ids), path=path, depth=path.count("/") - 1
+                )
+                for id, path in paths.items()
+            ],
+            ["path", "depth"],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def _resolve(parent_id: int | None, real_ids: dict[int, int]) -> int | None:
+        if parent_id is None or parent_id > 0:
+            return parent_id
+        return real_ids[parent_id]
 
 
 class CategorySimilarityAddSerializer(serializers.Serializer):
     id = serializers.IntegerField()
+
+
+class CategorySimilarityBulkSerializer(serializers.Serializer):
+    """
+    Adds and removes similarities between pairs of categories in one transaction.
+    Pairs are unordered, [a, b] and [b, a] are the same similarity.
+    """
+
+    max_pairs = 100_000
+    write_batch_size = 1000
+
+    add = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.IntegerField(min_value=1), min_length=2, max_length=2
+        ),
+        required=False,
+        max_length=max_pairs,
+    )
+    remove = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.IntegerField(min_value=1), min_length=2, max_length=2
+        ),
+        required=False,
+        max_length=max_pairs,
+    )
+
+    def validate(self, attrs):
+        add = _similarity_pairs(attrs.get("add", []))
+        remove = _similarity_pairs(attrs.get("remove", []))
+
+        if any(a == b for a, b in add | remove):
+            raise serializers.ValidationError("A category cannot be similar to itself.")
+
+        if add & remove:
+            raise serializers.ValidationError(
+                "A pair cannot be both added and removed."
+            )
+
+        ids = {id for pair in add | remove for id in pair}
+        unknown_ids = ids - set(
+            Category.objects.filter(pk__in=ids).values_list("id", flat=True)
+        )
+        if unknown_ids:
+            raise serializers.ValidationError(
+                f"Unknown categories: {', '.join(map(str, sorted(unknown_ids)))}"
+            )
+
+        return {"add": add, "remove": remove}
+
+    @transaction.atomic
+    def create(self, validated_data) -> set[int]:
+        """
+        Writes the through table rows of both directions of each pair.
+        Returns the ids of the categories whose similarities were written.
+        """
+        through = Category.similar_to.through
+        add, remove = validated_data["add"], validated_data["remove"]
+
+        through.objects.bulk_create(
+            (
+                through(from_category_id=from_id, to_category_id=to_id)
+                for a, b in add
+                for from_id, to_id in ((a, b), (b, a))
+            ),
+            batch_size=self.write_batch_size,
+            ignore_conflicts=True,
+        )
+
+        remove = list(remove)
+        for i in range(0, len(remove), self.write_batch_size):
+            rows = Q()
+            for a, b in remove[i : i + self.write_batch_size]:
+                rows |= Q(from_category_id=a, to_category_id=b)
+                rows |= Q(from_category_id=b, to_category_id=a)
+            through.objects.filter(rows).delete()
+
+        # Their similar_to changed, as when adding/removing one similarity.
+        ids = {id for pair in add | set(remove) for id in pair}
+        Category.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+        return ids
+
+
+def _similarity_pairs(pairs: list[list[int]]) -> set[tuple[int, int]]:
+    """
+    The pairs as a set of (smaller id, larger id), without symmetric duplicates.
+    """
+    return {(min(pair), max(pair)) for pair in pairs}
@@ -1,4 +1,6 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 
@@ -19,10 +21,13 @@ class CategorySimilarityViewSet(viewsets.ViewSet):
 
     def list(self, request, category_pk=None):
         category = self.get_category()
-        similarities = category.similar_to.all()
+        similarities = category.similar_to.with_similar_to()
         serializer = CategorySerializer(similarities, many=True)
         return Response(serializer.data)
 
+    # Atomic, so the categories version changes (on commit, see categories_app.signals)
+    # only once the categories are touched too.
+    @transaction.atomic
     def create(self, request, category_pk=None):
         category = self.get_category()
         serializer = CategorySimilarityAddSerializer(data=request.data)
@@ -38,12 +43,25 @@ class CategorySimilarityViewSet(viewsets.ViewSet):
             )
 
         category.similar_to.add(similar_category)
+        _touch(category, similar_category)
         return Response(
             CategorySerializer(similar_category).data, status=status.HTTP_201_CREATED
         )
 
+    @transaction.atomic
     def destroy(self, request, pk=None, category_pk=None):
         category = self.get_category()
         similar_category = get_object_or_404(Category, pk=pk)
         category.similar_to.remove(similar_category)
+        _touch(category, similar_category)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _touch(*categories: Category) -> None:
+    """
+    Marks the categories as modified, since their similar_to changed.
+    """
+    now = timezone.now()
+    Category.objects.filter(pk__in=[c.pk for c in categories]).update(updated_at=now)
+    for category in categories:
+        category.updated_at = now
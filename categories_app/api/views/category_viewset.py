@@ -1,24 +1,68 @@
-from datetime import timedelta
-from typing import Final, Iterable
-from django.core.cache import cache
+import hashlib
+from calendar import timegm
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+
 from django.db import transaction
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 
 from categories_app.models import Category
-from categories_app.api.serializers import CategorySerializer
-from categories_app.lib.category_tree import CategoryTree
+from categories_app.api.pagination import CategoryKeysetPagination
+from categories_app.api.renderers import NDJSONRenderer, render_json
+from categories_app.api.serializers import (
+    CategoryBulkSerializer,
+    CategoryReadSerializer,
+    CategorySerializer,
+    CategorySimilarityBulkSerializer,
+)
+from categories_app.lib.category_cache import (
+    bump_categories_version,
+    get_cached_category_list,
+    get_categories_version,
+    get_category_name_index,
+    get_category_tree,
+    invalidate_category_tree,
+)
+
+
+class CategoryFieldsMixin:
+    """
+    Sparse fieldsets, e.g. ?fields=id,name,parent returns only those fields of each category.
+    """
+
+    def _parse_fields(self) -> list[str] | None:
+        fields_str = self.request.query_params.get("fields")
+        if not fields_str:
+            return None
+
+        fields = [field.strip() for field in fields_str.split(",") if field.strip()]
+        if not fields:
+            raise ValidationError("query param fields must list at least one field")
 
-# The category tree is cached and reused for list requests.
-# It is evicted from the cache on create/update/delete of categories.
-_CACHE_KEY_CATEGORY_TREE: Final[str] = "category_tree"
-_CACHE_TIMEOUT_CATEGORY_TREE: Final[int] = timedelta(minutes=5).seconds
+        invalid_fields = [
+            field
+            for field in fields
+            if field not in self.read_serializer_class.all_fields
+        ]
+        if invalid_fields:
+            raise ValidationError(f"Invalid fields: {', '.join(invalid_fields)}")
 
+        return fields
 
-class CategoryListMixin:
+
+class CategoryListMixin(CategoryFieldsMixin):
     """
     Filterable by query params:
         - name (case insensitive, partial match)
@@ -30,22 +74,88 @@ class CategoryListMixin:
     Orderable by name, parent, created_at, updated_at, e.g. ?order_by=name.
     Reverse ordering e.g. ?order_by=-name.
 
-    Pagination (with default settings) comes our of the box.
+    Cursor paginated with ?page_size=N, e.g. ?page_size=100&order_by=name.
+    The response then holds the page in "results" and the url of the next page in "next".
+    Without page_size, all matching categories are returned as a list.
+
+    Only some fields of each category are returned with e.g. ?fields=id,name,parent.
+
+    Full exports can be streamed, with flat memory use regardless of the number of categories:
+        - ?stream=1 streams the JSON list
+        - Accept: application/x-ndjson (or ?format=ndjson) streams one JSON category per line
+
+    Responses carry an ETag, which changes whenever any category is written.
+    A request with a matching If-None-Match gets a 304 without querying the categories.
+
+    Non-streamed responses are cached by query params and categories version,
+    so repeated queries are a single cache get until the next write.
     """
 
     _orderable_fields: set[str] = {"name", "parent", "created_at", "updated_at"}
+    _stream_chunk_size: int = 1000
 
     def list(self, request):
         self._parse_query_params()
+
+        etag = _etag(request)
+        if not_modified := _not_modified(request, etag):
+            return not_modified
+
+        response = self._list_response(request)
+        response.headers["ETag"] = etag
+        return response
+
+    def _list_response(self, request):
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(
+                (row + b"\n" for row in self._stream_rows(self._rows())),
+                content_type=NDJSONRenderer.media_type,
+            )
+
+        if self.qparam_stream:
+            return StreamingHttpResponse(
+                _json_list(self._stream_rows(self._rows())),
+                content_type="application/json",
+            )
+
+        data = get_cached_category_list(self._list_cache_key(request), self._list_data)
+        return Response(data)
+
+    def _rows(self) -> QuerySet:
         queryset = self._filter_queryset(self.queryset)
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(serializer.data)
+        order_fields = (
+            [self.qparam_order_by.lstrip("-")] if self.qparam_order_by else []
+        )
+        return self.read_serializer_class.values(
+            queryset, self.qparam_fields, extra_fields=order_fields
+        )
+
+    def _list_data(self) -> "list[dict] | dict":
+        rows = self._rows()
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rows, self.request, view=self)
+        if page is not None:
+            serializer = self.read_serializer_class(page, self.qparam_fields)
+            return paginator.get_paginated_response(serializer.data).data
+
+        serializer = self.read_serializer_class(list(rows), self.qparam_fields)
+        return serializer.data
+
+    def _list_cache_key(self, request) -> str:
+        """
+        The query params in a canonical order, plus the host, which is part of the pagination links.
+        The format param is kept too, as the next link carries it.
+        """
+        params = sorted(request.query_params.lists())
+        return f"{request.scheme}://{request.get_host()}?{params}"
 
     def _parse_query_params(self):
         self.qparam_name: str | None = None
         self.qparam_ancestor_id: int | None = None
         self.qparam_max_depth: int | None = None
         self.qparam_order_by: str | None = None
+        self.qparam_stream: bool = False
+        self.qparam_fields: list[str] | None = None
 
         self.qparam_name = self.request.query_params.get("name")
 
@@ -75,42 +185,333 @@ class CategoryListMixin:
             if field_name not in self._orderable_fields:
                 raise ValidationError(f"Invalid order_by field: {field_name}")
 
-    def _filter_queryset(self, queryset: QuerySet[Category]) -> Iterable[Category]:
+        self.qparam_stream = self.request.query_params.get("stream") in ("1", "true")
+        self.qparam_fields = self._parse_fields()
+
+    def _filter_queryset(self, queryset: QuerySet[Category]) -> QuerySet[Category]:
         queryset = Category.objects.all()
 
         if self.qparam_order_by:
-            queryset = queryset.order_by(self.qparam_order_by)
+            # Ties are broken by id in the same direction, as in the paginated list.
+            tie_breaker = "-id" if self.qparam_order_by.startswith("-") else "id"
+            queryset = queryset.order_by(self.qparam_order_by, tie_breaker)
 
         if self.qparam_name:
-            queryset = queryset.filter(name__icontains=self.qparam_name)
+            # Resolved by the in-process name index rather than a full table LIKE '%name%' scan.
+            category_ids = get_category_name_index().search(self.qparam_name)
+            queryset = queryset.filter(id__in=category_ids)
+
+        if self.qparam_ancestor_id is not None:
+            ancestor_path = (
+                Category.objects.filter(pk=self.qparam_ancestor_id)
+                .values_list("path", flat=True)
+                .first()
+            )
+            if ancestor_path is None:
+                return queryset.none()
 
-        category_tree = self._get_category_tree()
-        queryset = category_tree.filter(
-            queryset=queryset,
-            ancestor_id=self.qparam_ancestor_id,
-            max_depth=self.qparam_max_depth,
-        )
+            queryset = queryset.subtree(ancestor_path, self.qparam_max_depth)
+        elif self.qparam_max_depth is not None:
+            queryset = queryset.filter(depth__lte=self.qparam_max_depth)
 
         return queryset
 
-    def _get_category_tree(self) -> CategoryTree:
-        category_tree: CategoryTree = cache.get(_CACHE_KEY_CATEGORY_TREE)
-        if not category_tree:
-            category_tree = CategoryTree()
-            cache.set(
-                _CACHE_KEY_CATEGORY_TREE,
-                category_tree,
-                timeout=_CACHE_TIMEOUT_CATEGORY_TREE,
+    def _stream_rows(self, rows: QuerySet) -> Iterator[bytes]:
+        """
+        Yields the JSON of each category, fetching and serializing them chunk by chunk,
+        each chunk with its own keyset query (see CategoryKeysetPagination.chunks).
+        """
+        paginator = self.pagination_class()
+        for chunk in paginator.chunks(rows, self._stream_chunk_size, view=self):
+            for category in self.read_serializer_class(chunk, self.qparam_fields).data:
+                yield render_json(category)
+
+
+def _json_list(rows: Iterable[bytes]) -> Iterator[bytes]:
+    yield b"["
+    for i, row in enumerate(rows):
+        yield row if i == 0 else b"," + row
+    yield b"]"
+
+
+class CategoryAutocompleteMixin:
+    """
+    Categories whose name starts with ?prefix= (case insensitive), ordered by name,
+    for pickers that query on every keystroke, e.g. ?prefix=head&limit=5.
+    Optionally scoped to the subtree of ?ancestor_id=.
+
+    Served from the in-process name index and the cached category tree, without querying the db.
+    """
+
+    _autocomplete_default_limit: int = 10
+    _autocomplete_max_limit: int = 100
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        prefix = request.query_params.get("prefix", "")
+        limit = self._autocomplete_default_limit
+        ancestor_id = None
+
+        if limit_str := request.query_params.get("limit"):
+            err_msg = f"query param limit must be an integer between 1 and {self._autocomplete_max_limit}"
+            try:
+                limit = int(limit_str)
+            except ValueError:
+                raise ValidationError(err_msg)
+
+            if not 1 <= limit <= self._autocomplete_max_limit:
+                raise ValidationError(err_msg)
+
+        if ancestor_id_str := request.query_params.get("ancestor_id"):
+            err_msg = "query param ancestor_id must be a positive integer"
+            try:
+                ancestor_id = int(ancestor_id_str)
+            except ValueError:
+                raise ValidationError(err_msg)
+
+            if ancestor_id < 1:
+                raise ValidationError(err_msg)
+
+        index = get_category_name_index()
+        category_ids = index.starting_with(prefix)
+        if ancestor_id is not None:
+            tree = get_category_tree()
+            category_ids = (
+                id for id in category_ids if tree.is_descendant(id, ancestor_id)
             )
 
-        return category_tree
+        return Response(
+            [{"id": id, "name": index.name(id)} for id in islice(category_ids, limit)]
+        )
 
 
-class CategoryRetrieveMixin:
+def _etag(request, updated_at: datetime | None = None) -> str:
+    """
+    Strong ETag of a GET response, which depends only on the categories version,
+    the url (path and query params), the negotiated media type,
+    and the updated_at of the category of a single category response.
+    """
+    key = f"{get_categories_version()}:{request.get_full_path()}:{request.accepted_media_type}"
+    if updated_at is not None:
+        key += f":{updated_at.isoformat()}"
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def _not_modified(request, etag: str, last_modified: int | None = None):
+    """
+    A 304 response if the conditional headers of the request match, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response.headers["ETag"] = etag
+    return response
+
+
+class CategoryRetrieveMixin(CategoryFieldsMixin):
+    """
+    Responses carry an ETag (see CategoryListMixin, plus the category's updated_at)
+    and a Last-Modified of the category's updated_at,
+    so the conditional headers If-None-Match and If-Modified-Since get a 304 when nothing changed.
+
+    The category is looked up before the conditional headers are checked,
+    so the response changes with the category even on a write that did not change the version.
+    """
+
     def retrieve(self, request, pk=None):
-        category = get_object_or_404(self.queryset, pk=pk)
-        serializer = self.serializer_class(category)
-        return Response(serializer.data)
+        fields = self._parse_fields()
+        queryset = self.queryset.filter(pk=pk)
+        rows = list(self.read_serializer_class.values(queryset, fields, ["updated_at"]))
+        if not rows:
+            raise Http404
+
+        updated_at = rows[0]["updated_at"]
+        etag = _etag(request, updated_at)
+        last_modified = timegm(updated_at.utctimetuple())
+        if not_modified := _not_modified(request, etag, last_modified):
+            return not_modified
+
+        serializer = self.read_serializer_class(rows, fields)
+        response = Response(serializer.data[0])
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class CategoryBatchRetrieveMixin(CategoryFieldsMixin):
+    """
+    Many categories by id in one request, e.g. ?ids=3,1,2 (and optionally ?fields=).
+    The categories are in the requested order, and the ids that do not exist are reported:
+        {"results": [...], "missing": [2]}
+    """
+
+    _batch_max_ids: int = 1000
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        ids = _parse_ids(request, self._batch_max_ids)
+        fields = self._parse_fields()
+
+        etag = _etag(request)
+        if not_modified := _not_modified(request, etag):
+            return not_modified
+
+        queryset = self.queryset.filter(pk__in=ids)
+        rows = list(self.read_serializer_class.values(queryset, fields))
+        # The rows always have the id, the output only if it is one of the fields.
+        data = self.read_serializer_class(rows, fields).data
+        data_by_id = {row["id"]: category for row, category in zip(rows, data)}
+
+        response = Response(
+            {
+                "results": [data_by_id[id] for id in ids if id in data_by_id],
+                "missing": [id for id in ids if id not in data_by_id],
+            }
+        )
+        response.headers["ETag"] = etag
+        return response
+
+
+def _parse_ids(request, max_ids: int) -> list[int]:
+    """
+    The ?ids= query param, a comma separated list of positive integers.
+    Duplicates are dropped, keeping the first position.
+    """
+    err_msg = f"query param ids must be a comma separated list of 1 to {max_ids} positive integers"
+    try:
+        ids = [int(id) for id in request.query_params.get("ids", "").split(",")]
+    except ValueError:
+        raise ValidationError(err_msg)
+
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > max_ids or any(id < 1 for id in ids):
+        raise ValidationError(err_msg)
+
+    return ids
+
+
+class CategoryAncestorsMixin:
+    """
+    Breadcrumbs, the path of {id, name} from the top-level category down to the category:
+        - GET /categories/{id}/ancestors/
+        - GET /categories/ancestors/?ids=1,2,3 for many categories,
+          {"results": [{"id": 1, "ancestors": [...]}, ...], "missing": [...]}
+
+    Served from the cached category tree and the in-process name index, without querying the db.
+    """
+
+    _ancestors_max_ids: int = 1000
+
+    @action(detail=True, methods=["get"])
+    def ancestors(self, request, pk=None):
+        tree = get_category_tree()
+        try:
+            ancestor_ids = tree.ancestors(int(pk))
+        except (KeyError, ValueError):
+            raise Http404
+
+        return Response(_breadcrumbs([ancestor_ids])[0])
+
+    # Named explicitly, as it would collide with the detail ancestors action.
+    @extend_schema(operation_id="categories_bulk_ancestors_retrieve")
+    @action(detail=False, methods=["get"], url_path="ancestors")
+    def bulk_ancestors(self, request):
+        ids = _parse_ids(request, self._ancestors_max_ids)
+        tree = get_category_tree()
+        found_ids = [id for id in ids if id in tree]
+
+        breadcrumbs = _breadcrumbs([tree.ancestors(id) for id in found_ids])
+        return Response(
+            {
+                "results": [
+                    {"id": id, "ancestors": ancestors}
+                    for id, ancestors in zip(found_ids, breadcrumbs)
+                ],
+                "missing": [id for id in ids if id not in tree],
+            }
+        )
+
+
+def _breadcrumbs(paths: list[list[int]]) -> list[list[dict]]:
+    """
+    The {id, name} of each category of the paths, with the names from the name index.
+    Names the index does not know yet (when it lags behind the tree) are read from the db.
+    """
+    index = get_category_name_index()
+    names: dict[int, str] = {}
+    unknown_ids = []
+    for id in {id for path in paths for id in path}:
+        try:
+            names[id] = index.name(id)
+        except KeyError:
+            unknown_ids.append(id)
+
+    if unknown_ids:
+        names.update(
+            Category.objects.filter(pk__in=unknown_ids).values_list("id", "name")
+        )
+
+    return [[{"id": id, "name": names.get(id)} for id in path] for path in paths]
+
+
+class CategoryNestedTreeMixin(CategoryFieldsMixin):
+    """
+    GET /categories/{id}/tree/ returns the category with its subtree as nested JSON,
+    each category with its "children", e.g. for navigation menus.
+    Limited to ?max_depth= levels below the category, and to ?fields= of each category.
+
+    The nesting comes from the cached category tree, so its cost is proportional
+    to the size of the subtree: one query for the rows, plus one for similar_to if requested.
+    """
+
+    @action(detail=True, methods=["get"])
+    def tree(self, request, pk=None):
+        fields = self._parse_fields()
+        max_depth = None
+        if max_depth_str := request.query_params.get("max_depth"):
+            err_msg = "query param max_depth must be a nonnegative integer"
+            try:
+                max_depth = int(max_depth_str)
+            except ValueError:
+                raise ValidationError(err_msg)
+
+            if max_depth < 0:
+                raise ValidationError(err_msg)
+
+        tree = get_category_tree()
+        try:
+            root_id = int(pk)
+        except ValueError:
+            raise Http404
+        if root_id not in tree:
+            raise Http404
+
+        etag = _etag(request)
+        if not_modified := _not_modified(request, etag):
+            return not_modified
+
+        ids = tree.descendants(root_id, max_depth)
+        rows = list(
+            self.read_serializer_class.values(self.queryset.filter(pk__in=ids), fields)
+        )
+        data = self.read_serializer_class(rows, fields).data
+        data_by_id = {row["id"]: category for row, category in zip(rows, data)}
+
+        # Pre-order, so a parent is always nested before its children.
+        nodes: dict[int, dict] = {}
+        for id in ids:
+            if id not in data_by_id:
+                continue
+
+            nodes[id] = {**data_by_id[id], "children": []}
+            if id != root_id and (parent := nodes.get(tree.parent_id(id))):
+                parent["children"].append(nodes[id])
+
+        if root_id not in nodes:
+            raise Http404
+
+        response = Response(nodes[root_id])
+        response.headers["ETag"] = etag
+        return response
 
 
 class CategoryCreateMixin:
@@ -118,13 +519,69 @@ class CategoryCreateMixin:
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             category = serializer.save()
-            cache.delete(_CACHE_KEY_CATEGORY_TREE)
             return Response(
                 self.serializer_class(category).data, status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CategoryBulkMixin:
+    """
+    Creates and updates a batch of categories in one request and one transaction,
+    e.g. to load a whole taxonomy. New categories can be parents of others in the batch:
+        {"categories": [
+            {"ref": "books", "name": "Books"},
+            {"ref": "novels", "name": "Novels", "parent_ref": "books"},
+            {"id": 12, "parent_ref": "books"},
+            {"id": 13, "name": "Renamed"}
+        ]}
+    Returns the categories of the batch, in the order of the batch.
+    """
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = CategoryBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = serializer.save()
+        # Bulk writes send no signals (see categories_app.signals).
+        # The cached tree is rebuilt once on the next read, rather than patched per category.
+        invalidate_category_tree()
+        bump_categories_version()
+
+        rows = self.read_serializer_class.values(self.queryset.filter(pk__in=ids))
+        data_by_id = {
+            category["id"]: category
+            for category in self.read_serializer_class(list(rows)).data
+        }
+        return Response([data_by_id[id] for id in ids], status=status.HTTP_200_OK)
+
+
+class CategorySimilarityBulkMixin:
+    """
+    Adds and removes many similarities in one request and one transaction:
+        POST /categories/similarities/ {"add": [[1, 2], [3, 4]], "remove": [[5, 6]]}
+    """
+
+    # Named explicitly, as it would collide with the create of the nested similarities.
+    @extend_schema(
+        operation_id="categories_bulk_similarities_create",
+        request=CategorySimilarityBulkSerializer,
+        responses={204: None},
+    )
+    @action(detail=False, methods=["post"], url_path="similarities")
+    def bulk_similarities(self, request):
+        serializer = CategorySimilarityBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer.save()
+        # Bulk writes send no signals (see categories_app.signals).
+        bump_categories_version()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CategoryDestroyMixin:
     """
     Delete a category and move its children to the deleted category's parent.
@@ -135,21 +592,76 @@ class CategoryDestroyMixin:
     def destroy(self, request, pk=None):
         category = get_object_or_404(self.queryset, pk=pk)
 
-        Category.objects.filter(parent=category).update(parent=category.parent)
+        # The children and the similar categories change representation, so they are touched too.
+        now = timezone.now()
+        Category.objects.filter(parent=category).update(
+            parent=category.parent, updated_at=now
+        )
+        category.similar_to.update(updated_at=now)
+        Category.objects.subtree(category.path).exclude(pk=category.pk).rebase_paths(
+            category.path, category.parent_path
+        )
+        # The cached tree moves the children to the parent too, see CategoryTree.delete.
         category.delete()
-        cache.delete(_CACHE_KEY_CATEGORY_TREE)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CategorySubtreeMixin:
+    """
+    Whole-branch operations, each a few set-based statements in one transaction,
+    however large the subtree is:
+        - POST /categories/{id}/move/ {"parent": id or null} moves the category with its subtree
+        - DELETE /categories/{id}/subtree/ deletes the category with its subtree
+    """
+
+    @action(detail=True, methods=["post"])
+    @transaction.atomic
+    def move(self, request, pk=None):
+        category = get_object_or_404(self.queryset, pk=pk)
+        if "parent" not in request.data:
+            raise ValidationError({"parent": ["This field is required."]})
+
+        serializer = self.serializer_class(
+            category, data={"parent": request.data["parent"]}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        # Saving the parent rebases the paths of the whole subtree in one UPDATE.
+        serializer.save()
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["delete"])
+    @transaction.atomic
+    def subtree(self, request, pk=None):
+        category = get_object_or_404(self.queryset, pk=pk)
+        subtree = Category.objects.subtree(category.path)
+        subtree_ids = list(subtree.values_list("id", flat=True))
+
+        # Categories outside the subtree that lose a similarity are touched, as in destroy.
+        similarities = Category.similar_to.through.objects.filter(
+            Q(from_category_id__in=subtree_ids) | Q(to_category_id__in=subtree_ids)
+        )
+        Category.objects.filter(
+            pk__in=similarities.values_list("to_category_id", flat=True)
+        ).exclude(pk__in=subtree_ids).update(updated_at=timezone.now())
+        similarities.delete()
+
+        # Unlink the parents first, so the rows can be deleted in any order.
+        subtree.update(parent=None)
+        Category.objects.filter(pk__in=subtree_ids).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class CategoryUpdateMixin:
+    @transaction.atomic
     def partial_update(self, request, pk=None):
         category = get_object_or_404(self.queryset, pk=pk)
 
         serializer = self.serializer_class(category, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            cache.delete(_CACHE_KEY_CATEGORY_TREE)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -157,11 +669,22 @@ class CategoryUpdateMixin:
 
 class CategoryViewSet(
     CategoryListMixin,
+    CategoryAutocompleteMixin,
     CategoryRetrieveMixin,
+    CategoryBatchRetrieveMixin,
+    CategoryAncestorsMixin,
+    CategoryNestedTreeMixin,
     CategoryCreateMixin,
+    CategoryBulkMixin,
+    CategorySimilarityBulkMixin,
     CategoryDestroyMixin,
     CategoryUpdateMixin,
+    CategorySubtreeMixin,
     viewsets.ViewSet,
 ):
     serializer_class = CategorySerializer
+    # Fast path for list/retrieve, with the same output as serializer_class.
+    read_serializer_class = CategoryReadSerializer
+    pagination_class = CategoryKeysetPagination
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer, NDJSONRenderer]
     queryset: QuerySet[Category] = Category.objects.all()
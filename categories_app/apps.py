@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CategoriesAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "categories_app"
+
+    def ready(self):
+        from categories_app import signals  # noqa: F401
@@ -0,0 +1,165 @@
+import hashlib
+import random
+import time
+from datetime import timedelta
+from typing import Callable, Final, TypeVar
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from categories_app.lib.category_name_index import CategoryNameIndex
+from categories_app.lib.category_tree import CategoryTree
+
+# The category tree, for hierarchy lookups, is built from all categories and cached across requests.
+# It is patched in place on create/update/delete of categories,
+# and evicted from the cache (to be rebuilt on the next read) only if patching fails.
+# The cached tree is stored with the number of the last write it reflects, see update_category_tree.
+_CACHE_KEY_CATEGORY_TREE: Final[str] = "category_tree"
+_CACHE_KEY_CATEGORY_TREE_WRITES: Final[str] = "category_tree_writes"
+# Opaque token that changes on every write of categories, for ETags and cached API responses.
+_CACHE_KEY_CATEGORIES_VERSION: Final[str] = "categories_version"
+_CACHE_KEY_PREFIX_CATEGORY_LIST: Final[str] = "category_list"
+_CACHE_TIMEOUT: Final[int] = timedelta(minutes=5).seconds
+
+T = TypeVar("T")
+
+# (writes, expiry, tree)
+_local_tree: tuple[int, float, CategoryTree] | None = None
+_local_name_index: tuple[str, CategoryNameIndex] | None = None
+
+
+def get_category_tree() -> CategoryTree:
+    """
+    The cached tree if it reflects the last write, else a tree rebuilt from the db.
+    Also held per process until the next write (or the cache timeout),
+    so it is not unpickled on every read.
+    """
+    global _local_tree
+    writes = _get_tree_writes()
+    if (
+        _local_tree is not None
+        and _local_tree[0] == writes
+        and _local_tree[1] > time.monotonic()
+    ):
+        return _local_tree[2]
+
+    entry: tuple[int, CategoryTree] | None = cache.get(_CACHE_KEY_CATEGORY_TREE)
+    if entry is not None and entry[0] == writes:
+        tree = entry[1]
+    else:
+        tree = CategoryTree()
+        # Not cached if a write was counted meanwhile, the tree may or may not include it.
+        if _get_tree_writes() == writes:
+            cache.set(_CACHE_KEY_CATEGORY_TREE, (writes, tree), timeout=_CACHE_TIMEOUT)
+
+    _local_tree = (writes, time.monotonic() + _CACHE_TIMEOUT, tree)
+    return tree
+
+
+def update_category_tree(apply_delta: Callable[[CategoryTree], None]) -> None:
+    """
+    Applies a delta (e.g. CategoryTree.insert) to the cached tree and stores it back,
+    once the current transaction commits, so the tree never has writes that are rolled back.
+
+    Each write takes the next number of a shared counter (an atomic cache incr),
+    and patches the cached tree only if it reflects exactly the writes before it.
+    Otherwise writes overlapped, and the tree is evicted rather than risk losing one of them.
+    """
+    transaction.on_commit(lambda: _update_tree(apply_delta))
+
+
+def invalidate_category_tree() -> None:
+    def invalidate() -> None:
+        _next_tree_write()
+        cache.delete(_CACHE_KEY_CATEGORY_TREE)
+
+    transaction.on_commit(invalidate)
+
+
+def get_category_name_index() -> CategoryNameIndex:
+    """
+    The name index of the current categories version, held per process rather than in the cache:
+    the cache pickles values, and unpickling the index on every request
+    would cost more than the lookups it saves. Rebuilt on the first read after a write.
+    """
+    global _local_name_index
+    version = get_categories_version()
+    if _local_name_index is None or _local_name_index[0] != version:
+        _local_name_index = (version, CategoryNameIndex())
+
+    return _local_name_index[1]
+
+
+def get_categories_version() -> str:
+    """
+    A random token rather than a counter, so a version that was evicted from the cache
+    is never reissued for different data.
+    """
+    return _get(_CACHE_KEY_CATEGORIES_VERSION, lambda: uuid4().hex)
+
+
+def bump_categories_version() -> None:
+    cache.set(_CACHE_KEY_CATEGORIES_VERSION, uuid4().hex, timeout=_CACHE_TIMEOUT)
+
+
+def get_cached_category_list(query_key: str, build: Callable[[], T]) -> T:
+    """
+    Cached list response data for a query, built on a miss.
+    The cache key includes the categories version, so a write invalidates all cached lists
+    at once, without enumerating them - entries of old versions are never read again and expire.
+    """
+    query_hash = hashlib.sha1(query_key.encode()).hexdigest()
+    key = f"{_CACHE_KEY_PREFIX_CATEGORY_LIST}:{get_categories_version()}:{query_hash}"
+    return _get(key, build)
+
+
+def _get(key: str, build: Callable[[], T]) -> T:
+    value: T = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=_CACHE_TIMEOUT)
+
+    return value
+
+
+def _update_tree(apply_delta: Callable[[CategoryTree], None]) -> None:
+    """
+    If nothing is cached, there is nothing to patch - the next read builds it fresh.
+    """
+    write = _next_tree_write()
+    entry: tuple[int, CategoryTree] | None = cache.get(_CACHE_KEY_CATEGORY_TREE)
+    if entry is None:
+        return
+    if entry[0] != write - 1:
+        cache.delete(_CACHE_KEY_CATEGORY_TREE)
+        return
+
+    tree = entry[1]
+    try:
+        apply_delta(tree)
+    except (KeyError, ValueError):
+        # The cached tree is out of sync with the db, fall back to a full rebuild.
+        cache.delete(_CACHE_KEY_CATEGORY_TREE)
+        return
+
+    cache.set(_CACHE_KEY_CATEGORY_TREE, (write, tree), timeout=_CACHE_TIMEOUT)
+
+
+def _get_tree_writes() -> int:
+    writes = cache.get(_CACHE_KEY_CATEGORY_TREE_WRITES)
+    if writes is None:
+        # A random start rather than 0, so a counter that was evicted from the cache
+        # does not restart at the number of a tree that is still cached.
+        cache.add(_CACHE_KEY_CATEGORY_TREE_WRITES, random.getrandbits(32), timeout=None)
+        writes = cache.get(_CACHE_KEY_CATEGORY_TREE_WRITES)
+
+    return writes
+
+
+def _next_tree_write() -> int:
+    try:
+        return cache.incr(_CACHE_KEY_CATEGORY_TREE_WRITES)
+    except ValueError:
+        _get_tree_writes()
+        return cache.incr(_CACHE_KEY_CATEGORY_TREE_WRITES)
@@ -0,0 +1,91 @@
+import unicodedata
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+
+from categories_app.models import Category
+
+
+class CategoryNameIndex:
+    """
+    In-memory index of category names, for case and accent insensitive search
+    (the semantics of name__icontains under the db's default _ai_ci collation)
+    without a LIKE '%x%' scan of the whole table.
+
+    The names are kept sorted, for prefix (autocomplete) lookups by binary search.
+    For substring search, the trigrams of every name are indexed on the first search:
+    a query of 3+ characters intersects the postings of its trigrams and verifies the few candidates,
+    a shorter one is a scan of the names.
+
+    The index is a read-only snapshot, rebuilt rather than patched when the categories change.
+    """
+
+    _gram_size = 3
+
+    def __init__(self, names: Iterable[tuple[int, str]] | None = None) -> None:
+        """
+        Builds the index from (id, name) pairs, by default those of all categories in the db.
+        """
+        if names is None:
+            names = Category.objects.values_list("id", "name")
+
+        self._names: dict[int, str] = dict(names)
+        self._normalized_names: dict[int, str] = {
+            id: _normalize_name(name) for id, name in self._names.items()
+        }
+        self._sorted: list[tuple[str, int]] = sorted(
+            (name, id) for id, name in self._normalized_names.items()
+        )
+        self._postings: dict[str, set[int]] | None = None
+
+    def search(self, query: str) -> set[int]:
+        """
+        Ids of the categories whose name contains `query`, case and accent insensitive.
+        """
+        query = _normalize_name(query)
+        if len(query) < self._gram_size:
+            return {id for name, id in self._sorted if query in name}
+
+        grams = {
+            query[i : i + self._gram_size]
+            for i in range(len(query) - self._gram_size + 1)
+        }
+        postings = self._get_postings()
+        candidates = set.intersection(
+            *sorted((postings.get(gram, set()) for gram in grams), key=len)
+        )
+        if len(grams) == 1:
+            return candidates
+        return {id for id in candidates if query in self._normalized_names[id]}
+
+    def name(self, category_id: int) -> str:
+        return self._names[category_id]
+
+    def starting_with(self, prefix: str) -> Iterator[int]:
+        """
+        Ids of the categories whose name starts with `prefix`, case and accent insensitive,
+        ordered by name (then id).
+        """
+        prefix = _normalize_name(prefix)
+        for name, id in self._sorted[bisect_left(self._sorted, (prefix,)) :]:
+            if not name.startswith(prefix):
+                return
+            yield id
+
+    def _get_postings(self) -> dict[str, set[int]]:
+        if self._postings is None:
+            postings: dict[str, set[int]] = {}
+            for id, name in self._normalized_names.items():
+                for i in range(len(name) - self._gram_size + 1):
+                    postings.setdefault(name[i : i + self._gram_size], set()).add(id)
+            self._postings = postings
+
+        return self._postings
+
+
+def _normalize_name(name: str) -> str:
+    """
+    The name case folded and without accents, e.g. "Café" -> "cafe",
+    as names compare under an accent insensitive collation.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
@@ -0,0 +1,29 @@
+from categories_app.models import Category
+
+
+def rebuild_category_paths() -> int:
+    """
+    Recomputes the materialized path and depth of every category from the parent ids.
+    Returns the number of categories whose path changed.
+    """
+    categories = list(Category.objects.only("id", "parent_id", "path", "depth"))
+
+    children: dict[int | None, list] = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    # Walk the tree top-down, so a parent's path is always known before its children's.
+    changed = []
+    stack = [(category, "") for category in children.get(None, [])]
+    while stack:
+        category, parent_path = stack.pop()
+        path = f"{parent_path}{category.id}/"
+        depth = path.count("/") - 1
+        if (category.path, category.depth) != (path, depth):
+            category.path, category.depth = path, depth
+            changed.append(category)
+
+        stack.extend((child, path) for child in children.get(category.id, []))
+
+    Category.objects.bulk_update(changed, ["path", "depth"], batch_size=1000)
+    return len(changed)
@@ -1,73 +1,254 @@
+from array import array
 from typing import Iterable
 
 from categories_app.models import Category
 
+# Parent index of top-level categories.
+_NO_PARENT = -1
+
 
 class CategoryTree:
     """
     Represents the set of Categories when regarded as a tree of parent/child relationships.
-    Filtering is done here as python is better suited for such recursive relationships than SQL.
-    """
-
-    def __init__(self) -> None:
-        all_categories = Category.objects.all()
-
-        self.depths: dict[int, int] = {}
-        self.categories: dict[int, Category] = {
-            category.id: category for category in all_categories
-        }
-
-        for category in all_categories:
-            self._memoize_depth(category.id)
+    Used for in-process hierarchy lookups, list filtering is done in SQL by Category.path.
 
-    def _memoize_depth(self, category_id: int) -> None:
-        if category_id in self.depths:
-            return
+    The tree is a compact snapshot, so it is cheap to pickle into the cache.
+    Categories are numbered 0..N-1 by position, and everything is stored in arrays indexed by position:
+    ids, parent positions, depths, a children adjacency and an interval (Euler tour) index.
+    Only the id -> position map is a dict, and it is rebuilt from the ids when unpickled.
 
-        parent_id = self.categories[category_id].parent_id
-        if parent_id is None:
-            self.depths[category_id] = 0
-            return
+    The interval index numbers categories in pre-order, and the subtree of a category
+    is exactly the range [entry, exit) of that numbering.
+    This makes "is X under A" an O(1) range check,
+    and lists the descendants of A in O(subtree size).
 
-        self._memoize_depth(parent_id)
-
-        self.depths[category_id] = self.depths[parent_id] + 1
+    The tree can be patched in place with insert/reparent/delete,
+    so a cached tree does not have to be rebuilt from the db on every write.
+    The deltas raise KeyError or ValueError if the tree is out of sync with the db.
+    """
 
-    def filter(
+    def __init__(
+        self, parent_ids: Iterable[tuple[int, int | None]] | None = None
+    ) -> None:
+        """
+        Builds the tree from (id, parent_id) pairs, by default those of all categories in the db.
+        Raises ValueError if the parents form a cycle.
+        """
+        if parent_ids is None:
+            parent_ids = Category.objects.values_list("id", "parent_id")
+
+        self._ids = array("q")
+        parent_id_list: list[int | None] = []
+        for id, parent_id in parent_ids:
+            self._ids.append(id)
+            parent_id_list.append(parent_id)
+
+        self._build_index_by_id()
+        self._parents = array("i", (self._position(id) for id in parent_id_list))
+
+        self._build_index()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_index_by_id"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._build_index_by_id()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self._index_by_id
+
+    def depth(self, category_id: int) -> int:
+        return self._depths[self._index_by_id[category_id]]
+
+    def parent_id(self, category_id: int) -> int | None:
+        parent = self._parents[self._index_by_id[category_id]]
+        return None if parent == _NO_PARENT else self._ids[parent]
+
+    def children(self, category_id: int) -> list[int]:
+        i = self._index_by_id[category_id]
+        return [self._ids[child] for child in self._child_positions(i)]
+
+    def ancestors(self, category_id: int) -> list[int]:
+        """
+        Ids of the path from the top-level category down to `category_id`, both included.
+        """
+        i = self._index_by_id[category_id]
+        path = []
+        while i != _NO_PARENT:
+            path.append(self._ids[i])
+            i = self._parents[i]
+        path.reverse()
+        return path
+
+    def insert(self, category: Category) -> None:
+        if category.id in self._index_by_id:
+            raise ValueError(f"Category {category.id} is already in the tree")
+        parent = self._position(category.parent_id)
+
+        self._index_by_id[category.id] = len(self._ids)
+        self._ids.append(category.id)
+        self._parents.append(parent)
+        self._build_index()
+
+    def reparent(self, category: Category) -> None:
+        parent = self._position(category.parent_id)
+
+        self._parents[self._index_by_id[category.id]] = parent
+        self._build_index()
+
+    def delete(self, category_id: int) -> None:
+        """
+        Removes the category and moves its children to the removed category's parent.
+        """
+        i = self._index_by_id.pop(category_id)
+        parent = self._parents[i]
+        for j, p in enumerate(self._parents):
+            if p == i:
+                self._parents[j] = parent
+
+        # Keep the arrays contiguous by moving the last category into the gap.
+        last = len(self._ids) - 1
+        if i != last:
+            self._ids[i] = self._ids[last]
+            self._parents[i] = self._parents[last]
+            self._index_by_id[self._ids[i]] = i
+            for j, p in enumerate(self._parents):
+                if p == last:
+                    self._parents[j] = i
+
+        self._ids.pop()
+        self._parents.pop()
+        self._build_index()
+
+    def delete_subtree(self, category_id: int) -> None:
+        """
+        Removes the category and all its descendants.
+        """
+        if category_id not in self._index_by_id:
+            raise KeyError(category_id)
+        self.delete_many(self.descendants(category_id))
+
+    def delete_many(self, category_ids: Iterable[int]) -> None:
+        """
+        Removes the categories at once, and moves the children of each removed category
+        to its closest ancestor that remains.
+        """
+        removed = {self._index_by_id[id] for id in category_ids}
+
+        def remaining_parent(i: int) -> int:
+            parent = self._parents[i]
+            while parent in removed:
+                parent = self._parents[parent]
+            return parent
+
+        # Renumber the remaining categories contiguously, in their current order.
+        kept = [i for i in range(len(self._ids)) if i not in removed]
+        new_positions = {i: new_i for new_i, i in enumerate(kept)}
+        new_positions[_NO_PARENT] = _NO_PARENT
+
+        self._ids = array("q", (self._ids[i] for i in kept))
+        self._parents = array("i", (new_positions[remaining_parent(i)] for i in kept))
+        self._build_index_by_id()
+        self._build_index()
+
+    def is_descendant(
         self,
-        queryset: Iterable[Category],
-        ancestor_id: int | None,
-        max_depth: int | None,
-    ) -> Iterable[Category]:
-        if ancestor_id is None:
-            if max_depth is None:
-                return queryset
-
-            return [c for c in queryset if self.depths[c.id] <= max_depth]
-
-        return [
-            c
-            for c in queryset
-            if self._category_has_ancestor(c.id, ancestor_id, max_depth)
-        ]
-
-    def _category_has_ancestor(
-        self,
-        category_id: int | None,
+        category_id: int,
         ancestor_id: int,
-        max_depth: int | None,
+        max_depth: int | None = None,
     ) -> bool:
-        if category_id is None:
+        """
+        Whether `category_id` is `ancestor_id` itself or in its subtree,
+        at most `max_depth` levels below it.
+        """
+        if category_id not in self._index_by_id or ancestor_id not in self._index_by_id:
             return False
 
-        if max_depth is not None and max_depth < 0:
+        i = self._index_by_id[category_id]
+        a = self._index_by_id[ancestor_id]
+        if not self._entry[a] <= self._entry[i] < self._exit[a]:
             return False
 
-        if category_id == ancestor_id:
-            return True
-
-        return self._category_has_ancestor(
-            self.categories[category_id].parent_id,
-            ancestor_id,
-            max_depth - 1 if max_depth is not None else None,
-        )
+        return max_depth is None or self._depths[i] - self._depths[a] <= max_depth
+
+    def descendants(self, ancestor_id: int, max_depth: int | None = None) -> list[int]:
+        """
+        Ids of `ancestor_id` and its descendants at most `max_depth` levels below it, in pre-order.
+        """
+        if ancestor_id not in self._index_by_id:
+            return []
+
+        a = self._index_by_id[ancestor_id]
+        subtree = self._preorder[self._entry[a] : self._exit[a]]
+        if max_depth is None:
+            return [self._ids[i] for i in subtree]
+
+        limit = self._depths[a] + max_depth
+        return [self._ids[i] for i in subtree if self._depths[i] <= limit]
+
+    def _position(self, category_id: int | None) -> int:
+        return _NO_PARENT if category_id is None else self._index_by_id[category_id]
+
+    def _build_index_by_id(self) -> None:
+        self._index_by_id: dict[int, int] = dict(zip(self._ids, range(len(self._ids))))
+
+    def _child_positions(self, i: int) -> array:
+        return self._children[self._child_offsets[i] : self._child_offsets[i + 1]]
+
+    def _build_index(self) -> None:
+        """
+        Builds the children adjacency, depths and the interval index in linear time,
+        iteratively, so arbitrarily deep chains do not hit the recursion limit.
+        """
+        n = len(self._ids)
+
+        # Children adjacency in CSR form, the children of position i are
+        # _children[_child_offsets[i] : _child_offsets[i + 1]].
+        # Top-level categories are the children of the virtual position n.
+        children: list[list[int]] = [[] for _ in range(n + 1)]
+        for i, parent in enumerate(self._parents):
+            children[n if parent == _NO_PARENT else parent].append(i)
+
+        self._children = array("i")
+        self._child_offsets = array("i", [0])
+        for child_positions in children:
+            self._children.extend(child_positions)
+            self._child_offsets.append(len(self._children))
+
+        # Single top-down pass, a category's depth is known once its parent is visited.
+        self._preorder = array("i")
+        self._depths = array("i", [0]) * n
+        stack = list(reversed(self._child_positions(n)))
+        while stack:
+            i = stack.pop()
+            parent = self._parents[i]
+            if parent != _NO_PARENT:
+                self._depths[i] = self._depths[parent] + 1
+
+            self._preorder.append(i)
+            stack.extend(reversed(self._child_positions(i)))
+
+        # Categories that are not reachable from the top-level ones are on (or below) a cycle.
+        if len(self._preorder) != n:
+            visited = set(self._preorder)
+            cycle_ids = [self._ids[i] for i in range(n) if i not in visited]
+            raise ValueError(f"Categories {cycle_ids} have cyclic parents")
+
+        # A subtree is a contiguous range of the pre-order, so exit = entry + subtree size.
+        self._entry = array("i", [0]) * n
+        for order, i in enumerate(self._preorder):
+            self._entry[i] = order
+
+        subtree_sizes = array("i", [1]) * n
+        for i in reversed(self._preorder):
+            parent = self._parents[i]
+            if parent != _NO_PARENT:
+                subtree_sizes[parent] += subtree_sizes[i]
+
+        self._exit = array("i", (self._entry[i] + subtree_sizes[i] for i in range(n)))
@@ -1,9 +1,22 @@
+import multiprocessing
+import time
+from array import array
 from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice, repeat
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator
 
-from django.db.models import Prefetch
+from django.db import connections
 
 from categories_app.models import Category
 
+# Distance of vertices that a BFS has not reached, and parent of its start vertex.
+_UNREACHED = -1
+# Sweeps of estimate_longest_rabbit_hole_length when neither a count nor a time budget is given.
+_DEFAULT_SWEEPS = 10
+
 
 class SimilarityGraph:
     """
@@ -15,84 +28,410 @@ class SimilarityGraph:
     Unweighted graph, so we don't need Dijkstra or Floyd-Warshall algorithm.
 
     BFS = O(E+V) = 2*10^5
-    longest_rabbit_hole (repeated BFS) = O(V*(E+V)) = 4 *10^8
+    longest_rabbit_hole (iFUB per island) = O(k*(E+V)) for k BFS runs,
+        k is a handful on sparse graphs with a long diameter, where eccentricities differ a lot,
+        but close to V on dense graphs with a diameter of a few similarities, e.g. at the scale above,
+        where most categories have to be checked (4*10^8, as BFS from every vertex)
+    estimate_longest_rabbit_hole_length = O(s*(E+V)) for s sweeps of 3 BFS runs
 
     DFS = O(V+E) = 2*10^5
     rabbit_islands (repeated DFS, but each vertex visited once) = 2*10^5
+
+    Categories are numbered 0..V-1 by position, and the adjacency is stored in CSR form:
+    the neighbors of position i are _neighbors[_offsets[i] : _offsets[i + 1]].
+    So the traversals only index flat arrays, rather than querysets of model instances.
     """
 
-    def __init__(self):
-        # Prefetch similars for each category to avoid N+1 problem.
-        # This results in just 2 db queries.
-        all_categories = Category.objects.prefetch_related(
-            Prefetch("similar_to", queryset=Category.objects.only("id"))
-        ).all()
+    def __init__(
+        self,
+        category_ids: Iterable[int] | None = None,
+        similarities: Iterable[tuple[int, int]] | None = None,
+    ) -> None:
+        """
+        Builds the graph from category ids and (from_id, to_id) similarity pairs,
+        by default those in the db, read from the similarity through table in 2 queries.
+        Similarities are symmetric, each pair is expected in both directions, as Django stores them.
+        """
+        if category_ids is None:
+            category_ids = Category.objects.order_by("id").values_list("id", flat=True)
+        if similarities is None:
+            similarities = Category.similar_to.through.objects.order_by(
+                "from_category_id", "to_category_id"
+            ).values_list("from_category_id", "to_category_id")
+
+        self._ids = array("q", category_ids)
+        self._index_by_id: dict[int, int] = dict(zip(self._ids, range(len(self._ids))))
+
+        edges = [
+            (self._index_by_id[from_id], self._index_by_id[to_id])
+            for from_id, to_id in similarities
+        ]
+
+        # Count the degrees, then place each neighbor at its vertex's next free slot.
+        n = len(self._ids)
+        self._offsets = array("i", [0]) * (n + 1)
+        for i, _ in edges:
+            self._offsets[i + 1] += 1
+        for i in range(n):
+            self._offsets[i + 1] += self._offsets[i]
+
+        self._neighbors = array("i", [0]) * len(edges)
+        next_slot = self._offsets[:-1]
+        for i, j in edges:
+            self._neighbors[next_slot[i]] = j
+            next_slot[i] += 1
+
+    def compute_longest_rabbit_hole(self, workers: int = 1) -> list[int]:
+        """
+        Ids of a longest shortest path between two categories, i.e. a diameter of the graph.
+        The same path as a BFS from every category would find: from the first category (by position)
+        whose eccentricity is the diameter, to the first category at that distance from it in BFS order,
+        visiting the neighbors of each category by position.
+
+        The diameter of each island is computed exactly with iFUB,
+        pruned by upper bounds of the eccentricities, which every BFS tightens.
+        The path is then found by BFS from the categories whose bound still reaches the diameter.
+
+        With `workers` > 1 the BFS runs of each fringe, and then of the candidate start categories,
+        are spread over a process pool that shares the adjacency arrays and the bounds (see _process_pool).
+        The result is the same as with one worker.
+        """
+        n = len(self._ids)
+        # ecc(v) <= ecc(u) + d(u, v) for every BFS source u, V - 1 until a BFS reaches v.
+        self._ecc_upper = array("i", [max(n - 1, 0)]) * n
+
+        islands = self._islands()
+        with self._process_pool(workers) as pool:
+            island_diameters = [
+                self._diameter(island, pool, workers) for island in islands
+            ]
+            diameter = max(island_diameters, default=0)
+            if diameter == 0:
+                return []
+
+            candidates = sorted(
+                i
+                for island, island_diameter in zip(islands, island_diameters)
+                if island_diameter == diameter
+                for i in island
+            )
+            start = self._first_with_eccentricity(candidates, diameter, pool, workers)
+            if start is None:
+                raise AssertionError("No category has the diameter as eccentricity")
+
+        distances, parents, order = self._bfs(start)
+        end = next(i for i in order if distances[i] == diameter)
+        return self._get_path(end, parents)
+
+    def estimate_longest_rabbit_hole_length(
+        self, sweeps: int | None = None, time_budget: float | None = None
+    ) -> tuple[int, int]:
+        """
+        Lower and upper bounds on the length (in similarities) of the longest rabbit hole,
+        for graphs too large for compute_longest_rabbit_hole.
+
+        Each sweep is a double sweep BFS (from a start category to the farthest one and back,
+        whose eccentricity is a lower bound), then a BFS from the middle of the path found.
+        Every BFS tightens the eccentricity upper bounds, whose maximum bounds the diameter,
+        and the next sweep starts from the category with the highest bound.
+        Runs `sweeps` sweeps and/or until `time_budget` seconds have passed,
+        or until the bounds meet, when they are exact.
+        """
+        if sweeps is None and time_budget is None:
+            sweeps = _DEFAULT_SWEEPS
+        deadline = None if time_budget is None else time.monotonic() + time_budget
+
+        # An island of k categories has no path longer than k - 1.
+        self._ecc_upper = array("i", [0]) * len(self._ids)
+        for island in self._islands():
+            for i in island:
+                self._ecc_upper[i] = len(island) - 1
+
+        offsets = self._offsets
+        lower = 0
+        done = 0
+        while sweeps is None or done < sweeps:
+            if deadline is not None and done > 0 and time.monotonic() >= deadline:
+                break
+
+            r = max(
+                range(len(self._ids)),
+                key=lambda i: (self._ecc_upper[i], offsets[i + 1] - offsets[i]),
+                default=None,
+            )
+            if r is None or self._ecc_upper[r] <= lower:
+                break
+
+            a = self._bfs_with_bounds(r)[2][-1]
+            distances, parents, order = self._bfs_with_bounds(a)
+            lower = max(lower, distances[order[-1]])
+            path = self._path_positions(order[-1], parents)
+            self._bfs_with_bounds(path[len(path) // 2])
+            done += 1
+
+        return lower, max(self._ecc_upper, default=0)
+
+    def _first_with_eccentricity(
+        self,
+        candidates: list[int],
+        eccentricity: int,
+        pool: Executor | None = None,
+        workers: int = 1,
+    ) -> int | None:
+        """
+        The first of the candidate positions whose eccentricity is `eccentricity`,
+        which must be the largest possible, skipping those whose upper bound is below it.
+        In parallel, the candidates are checked in order, `workers` at a time,
+        so at most workers - 1 BFS runs past the first match are wasted.
+        """
+        if pool is None:
+            for start in candidates:
+                if self._ecc_upper[start] < eccentricity:
+                    continue
+
+                distances, _, order = self._bfs_with_bounds(start)
+                if distances[order[-1]] == eccentricity:
+                    return start
+            return None
+
+        # Lazy, so each batch is filtered by the bounds as tightened by the previous batches.
+        remaining = (i for i in candidates if self._ecc_upper[i] >= eccentricity)
+        while batch := list(islice(remaining, workers)):
+            for start, ecc in zip(batch, pool.map(_worker_eccentricity, batch)):
+                if ecc == eccentricity:
+                    return start
+        return None
+
+    def _max_eccentricity(
+        self,
+        vertices: list[int],
+        lower: int,
+        pool: Executor | None = None,
+        workers: int = 1,
+    ) -> int:
+        """
+        The largest of `lower` and the eccentricities of the vertices,
+        skipping those whose upper bound is not above the largest found so far.
+        In parallel, the vertices are spread over the workers, each keeping its own largest.
+        """
+        if pool is not None:
+            vertices = [v for v in vertices if self._ecc_upper[v] > lower]
+            if len(vertices) > 1:
+                chunks = [vertices[k::workers] for k in range(workers)]
+                return max(
+                    pool.map(_worker_max_eccentricity, chunks, repeat(lower, workers))
+                )
+
+        for v in vertices:
+            if self._ecc_upper[v] > lower:
+                distances, _, order = self._bfs_with_bounds(v)
+                lower = max(lower, distances[order[-1]])
+        return lower
 
-        self.categories: dict[int, Category] = {
-            category.id: category for category in all_categories
-        }
+    @contextmanager
+    def _process_pool(self, workers: int) -> Iterator[Executor | None]:
+        """
+        A process pool whose workers see the CSR arrays and the eccentricity upper bounds
+        in shared memory, attached once per worker, so no graph data is pickled per task.
+        None for a single worker.
 
-    def compute_longest_rabbit_hole(self) -> list[int]:
-        max_dist: int = 0
-        longest_rabbit_hole: list[int] = []
-        for id in self.categories.keys():
-            distances, parents = self._bfs(id)
+        The bounds are shared with the main process while the pool is open,
+        so every BFS tightens them for all. Their updates are not locked:
+        a racing write may keep a looser bound, but every bound written is a valid one.
+        """
+        if workers <= 1 or not self._ids:
+            yield None
+            return
 
-            for category_id, dist in distances.items():
-                if dist > max_dist:
-                    max_dist = dist
-                    longest_rabbit_hole = self._get_path(category_id, parents)
+        arrays = (self._offsets, self._neighbors, self._ecc_upper)
+        shm = SharedMemory(create=True, size=sum(len(a) * a.itemsize for a in arrays))
+        ints = shm.buf.cast("i")
+        offsets_len, neighbors_len = len(self._offsets), len(self._neighbors)
+        ecc_upper = ints[
+            offsets_len + neighbors_len : offsets_len + neighbors_len + len(self._ids)
+        ]
+        try:
+            start = 0
+            for a in arrays:
+                ints[start : start + len(a)] = a
+                start += len(a)
+            self._ecc_upper = ecc_upper
 
-        return longest_rabbit_hole
+            # Forked workers inherit the db connections, which must not be shared.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(shm.name, offsets_len, neighbors_len),
+            ) as pool:
+                yield pool
+        finally:
+            self._ecc_upper = array("i", ecc_upper)
+            ecc_upper.release()
+            ints.release()
+            shm.close()
+            shm.unlink()
 
-    def _get_path(self, end_id: int, parents: dict[int, int]) -> list[int]:
-        id = end_id
+    def _diameter(
+        self, island: list[int], pool: Executor | None = None, workers: int = 1
+    ) -> int:
+        """
+        The exact diameter of an island, by iFUB (iterative Fringe Upper Bound).
+
+        A double sweep gives a lower bound and a central vertex u.
+        The vertices of the fringe at distance i from u are then the only ones
+        that can have eccentricity above 2(i - 1), so the fringes are checked from the farthest in,
+        until the lower bound reaches the upper bound.
+        The BFS runs of a fringe are independent, so they are spread over the pool, if any.
+        """
+        if len(island) <= 2:
+            return len(island) - 1
+
+        # Double sweep, from a vertex of maximum degree to the farthest vertex and back.
+        offsets = self._offsets
+        r = max(island, key=lambda i: offsets[i + 1] - offsets[i])
+        a = self._bfs_with_bounds(r)[2][-1]
+        distances, parents, order = self._bfs_with_bounds(a)
+        lower = distances[order[-1]]
+
+        # The middle of the a-b path is a good central vertex.
+        path = self._path_positions(order[-1], parents)
+        u = path[len(path) // 2]
+        distances, _, order = self._bfs_with_bounds(u)
+        ecc_u = distances[order[-1]]
+        lower = max(lower, ecc_u)
+
+        fringes: list[list[int]] = [[] for _ in range(ecc_u + 1)]
+        for v in order:
+            fringes[distances[v]].append(v)
+
+        i = ecc_u
+        upper = 2 * ecc_u
+        while upper > lower:
+            lower = self._max_eccentricity(fringes[i], lower, pool, workers)
+
+            if lower > 2 * (i - 1):
+                break
+            upper = 2 * (i - 1)
+            i -= 1
+
+        return lower
+
+    def _bfs_with_bounds(self, start: int) -> tuple[array, array, list[int]]:
+        """
+        BFS that also tightens the eccentricity upper bounds of the vertices it reaches.
+        """
+        distances, parents, order = self._bfs(start)
+        ecc = distances[order[-1]]
+        ecc_upper = self._ecc_upper
+        for v in order:
+            if ecc + distances[v] < ecc_upper[v]:
+                ecc_upper[v] = ecc + distances[v]
+
+        return distances, parents, order
+
+    def _islands(self) -> list[list[int]]:
+        visited = bytearray(len(self._ids))
+        return [
+            self._dfs(start, visited)
+            for start in range(len(self._ids))
+            if not visited[start]
+        ]
+
+    @classmethod
+    def _from_csr(cls, offsets, neighbors, ecc_upper) -> "SimilarityGraph":
+        """
+        A graph over existing CSR arrays and eccentricity upper bounds (e.g. views of shared memory),
+        for the traversals only. Positions stand in for the ids, which only the building process knows.
+        """
+        graph = cls.__new__(cls)
+        graph._ids = range(len(offsets) - 1)
+        graph._offsets = offsets
+        graph._neighbors = neighbors
+        graph._ecc_upper = ecc_upper
+        return graph
+
+    def _get_path(self, end: int, parents: array) -> list[int]:
+        return [self._ids[i] for i in self._path_positions(end, parents)]
+
+    def _path_positions(self, end: int, parents: array) -> list[int]:
+        i = end
         path: list[int] = []
-        while id:
-            path.append(id)
-            id = parents[id]
+        while i != _UNREACHED:
+            path.append(i)
+            i = parents[i]
         return list(reversed(path))
 
-    def _bfs(self, start_id: int) -> tuple[dict[int, int], dict[int, int]]:
-        queue: deque[int] = deque([start_id])
-        dist_from_start: dict[int, int] = {start_id: 0}
-        parents: dict[int, int] = {start_id: None}
+    def _bfs(self, start: int) -> tuple[array, array, list[int]]:
+        """
+        Distances (or _UNREACHED) and BFS tree parents of all positions, from the start position,
+        and the positions reached in BFS order, so the last one is the farthest.
+        """
+        neighbors, offsets = self._neighbors, self._offsets
+        dist_from_start = array("i", [_UNREACHED]) * len(self._ids)
+        parents = array("i", [_UNREACHED]) * len(self._ids)
+        dist_from_start[start] = 0
+        queue: deque[int] = deque([start])
+        order: list[int] = []
 
         while queue:
-            id = queue.popleft()
+            i = queue.popleft()
+            order.append(i)
+            dist = dist_from_start[i] + 1
 
-            for neighbor in self.categories[id].similar_to.all():
-                if neighbor.id not in dist_from_start:
-                    dist_from_start[neighbor.id] = dist_from_start[id] + 1
-                    parents[neighbor.id] = id
-                    queue.append(neighbor.id)
+            for k in range(offsets[i], offsets[i + 1]):
+                neighbor = neighbors[k]
+                if dist_from_start[neighbor] == _UNREACHED:
+                    dist_from_start[neighbor] = dist
+                    parents[neighbor] = i
+                    queue.append(neighbor)
 
-        return dist_from_start, parents
+        return dist_from_start, parents, order
 
     def compute_rabbit_islands(self) -> list[set[int]]:
-        visited: set[int] = set()
-        islands: list[set[int]] = []
-        for id in self.categories.keys():
-            if id in visited:
-                continue
-
-            island = self._dfs(id, visited)
-            islands.append(island)
-        return islands
+        return [{self._ids[i] for i in island} for island in self._islands()]
 
-    def _dfs(self, start_id: int, visited: set[int]) -> set[int]:
-        stack = [start_id]
-        island = set()
+    def _dfs(self, start: int, visited: bytearray) -> list[int]:
+        neighbors, offsets = self._neighbors, self._offsets
+        stack = [start]
+        island = []
 
         while stack:
-            id = stack.pop()
-            if id in visited:
+            i = stack.pop()
+            if visited[i]:
                 continue
 
-            visited.add(id)
-            island.add(id)
-            for neighbor in self.categories[id].similar_to.all():
-                if neighbor.id not in visited:
-                    stack.append(neighbor.id)
+            visited[i] = 1
+            island.append(i)
+            for k in range(offsets[i], offsets[i + 1]):
+                if not visited[neighbors[k]]:
+                    stack.append(neighbors[k])
 
         return island
+
+
+# The graph of a pool worker process, over the shared memory of the building process.
+_worker_graph: SimilarityGraph | None = None
+_worker_shm: SharedMemory | None = None
+
+
+def _init_worker(shm_name: str, offsets_len: int, neighbors_len: int) -> None:
+    global _worker_graph, _worker_shm
+    _worker_shm = SharedMemory(name=shm_name)
+    ints = _worker_shm.buf.cast("i")
+    neighbors_end = offsets_len + neighbors_len
+    _worker_graph = SimilarityGraph._from_csr(
+        ints[:offsets_len],
+        ints[offsets_len:neighbors_end],
+        ints[neighbors_end : neighbors_end + offsets_len - 1],
+    )
+
+
+def _worker_max_eccentricity(vertices: list[int], lower: int) -> int:
+    return _worker_graph._max_eccentricity(vertices, lower)
+
+
+def _worker_eccentricity(start: int) -> int:
+    distances, _, order = _worker_graph._bfs_with_bounds(start)
+    return distances[order[-1]]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from categories_app.lib.category_paths import rebuild_category_paths
+
+
+class Command(BaseCommand):
+    help = "Recomputes the materialized path and depth of every Category."
+
+    def add_arguments(self, parser):
+        pass
+
+    def handle(self, *args, **options):
+        changed = rebuild_category_paths()
+        self.stdout.write(self.style.SUCCESS(f"Updated paths of {changed} categories"))
@@ -0,0 +1,71 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from categories_app.lib.category_name_index import CategoryNameIndex
+from categories_app.lib.category_tree import CategoryTree
+from categories_app.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the autocomplete lookup (a name prefix scoped to a subtree) on generated categories, "
+        "past building the name index and the category tree. All generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[2_000, 100_000],
+            help="Numbers of categories to generate.",
+        )
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=1_000,
+            help="Lookups to time per size.",
+        )
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            with transaction.atomic():
+                self._benchmark(size, options["number"])
+                transaction.set_rollback(True)
+
+    def _benchmark(self, size: int, number: int) -> None:
+        parent = Category.objects.create(name="Benchmark parent")
+        Category.objects.bulk_create(
+            Category(
+                name=f"Benchmark {i}",
+                description="Generated",
+                parent=parent,
+                path="",
+                depth=1,
+            )
+            for i in range(size)
+        )
+        index = CategoryNameIndex()
+        tree = CategoryTree()
+
+        def lookup() -> list[dict]:
+            # What the autocomplete action does per request, past parsing the query params.
+            ids = (
+                id
+                for id in index.starting_with("benchmark 1")
+                if tree.is_descendant(id, parent.id)
+            )
+            return [{"id": id, "name": index.name(id)} for id in islice(ids, 10)]
+
+        assert len(lookup()) == 10, "Lookup found too few categories"
+        start = time.perf_counter()
+        for _ in range(number):
+            lookup()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{size:>7} categories: {elapsed / number * 1e6:.1f} us/lookup"
+        )
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from categories_app.api.renderers import render_json
+from categories_app.api.serializers import CategoryReadSerializer, CategorySerializer
+from categories_app.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares CategorySerializer with the CategoryReadSerializer fast path "
+        "on generated categories. All generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000],
+            help="Numbers of categories to serialize.",
+        )
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            with transaction.atomic():
+                self._benchmark(size)
+                transaction.set_rollback(True)
+
+    def _benchmark(self, size: int) -> None:
+        categories = Category.objects.bulk_create(
+            Category(name=f"Benchmark {i}", description="Generated", path="", depth=0)
+            for i in range(size)
+        )
+        # Chain each category to the next one as similar.
+        Category.similar_to.through.objects.bulk_create(
+            Category.similar_to.through(from_category_id=a.id, to_category_id=b.id)
+            for x, y in zip(categories, categories[1:])
+            for a, b in ((x, y), (y, x))
+        )
+        queryset = Category.objects.filter(name__startswith="Benchmark").order_by("id")
+
+        start = time.perf_counter()
+        slow = render_json(
+            CategorySerializer(queryset.with_similar_to(), many=True).data
+        )
+        slow_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = list(CategoryReadSerializer.values(queryset))
+        fast = render_json(CategoryReadSerializer(rows).data)
+        fast_elapsed = time.perf_counter() - start
+
+        assert fast == slow, "CategoryReadSerializer output differs"
+        self.stdout.write(
+            f"{size:>7} categories: CategorySerializer {slow_elapsed:.2f}s, "
+            f"CategoryReadSerializer {fast_elapsed:.2f}s "
+            f"({slow_elapsed / fast_elapsed:.1f}x faster)"
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from categories_app.lib.category_tree import CategoryTree
+
+
+class Command(BaseCommand):
+    help = (
+        "Times building a CategoryTree from a single chain of categories of growing depth. "
+        "Does not touch the db."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--depths",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Chain depths to time.",
+        )
+
+    def handle(self, *args, **options):
+        for depth in options["depths"]:
+            parent_ids = [
+                (id, id - 1 if id > 1 else None) for id in range(1, depth + 1)
+            ]
+
+            start = time.perf_counter()
+            tree = CategoryTree(parent_ids)
+            elapsed = time.perf_counter() - start
+
+            assert tree.depth(depth) == depth - 1
+            self.stdout.write(
+                f"depth={depth:>9}: {elapsed:.3f}s ({elapsed / depth * 1e6:.2f} us/category)"
+            )
@@ -1,4 +1,4 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from categories_app.lib.similarity_graph import SimilarityGraph
 
@@ -7,8 +7,46 @@ class Command(BaseCommand):
     help = "Prints the ids of the Categories in the longest rabbit hole."
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of processes to run the BFS searches in (default: 1).",
+        )
+        parser.add_argument(
+            "--approx",
+            action="store_true",
+            help="Print lower and upper bounds on the length of the longest rabbit hole instead, "
+            "from a few double sweep BFS runs.",
+        )
+        parser.add_argument(
+            "--sweeps",
+            type=int,
+            help="With --approx, number of double sweeps to run (default: 10, "
+            "or as many as fit in --time-budget).",
+        )
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            help="With --approx, seconds to keep sweeping for.",
+        )
 
     def handle(self, *args, **options):
-        path = SimilarityGraph().compute_longest_rabbit_hole()
-        print(path)
+        workers = options["workers"]
+        if workers is not None and workers < 1:
+            raise CommandError("--workers must be at least 1")
+
+        if not options["approx"]:
+            if options["sweeps"] is not None or options["time_budget"] is not None:
+                raise CommandError("--sweeps and --time-budget require --approx")
+
+            path = SimilarityGraph().compute_longest_rabbit_hole(workers=workers or 1)
+            print(path)
+            return
+
+        if workers is not None:
+            raise CommandError("--workers cannot be used with --approx")
+
+        lower, upper = SimilarityGraph().estimate_longest_rabbit_hole_length(
+            sweeps=options["sweeps"], time_budget=options["time_budget"]
+        )
+        print(f"Longest rabbit hole length: between {lower} and {upper}")
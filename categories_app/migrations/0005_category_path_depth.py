@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    """
+    Computes the materialized path and depth of every category from the parent ids.
+    Self-contained, so later changes to the app code can not break the migration.
+    """
+    Category = apps.get_model("categories_app", "Category")
+    categories = list(Category.objects.only("id", "parent_id"))
+
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    # Walk the tree top-down, so a parent's path is always known before its children's.
+    stack = [(category, "") for category in children.get(None, [])]
+    while stack:
+        category, parent_path = stack.pop()
+        category.path = f"{parent_path}{category.id}/"
+        category.depth = category.path.count("/") - 1
+        stack.extend((child, category.path) for child in children.get(category.id, []))
+
+    Category.objects.bulk_update(categories, ["path", "depth"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("categories_app", "0004_category_similar_to"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
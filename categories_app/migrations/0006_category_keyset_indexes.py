@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("categories_app", "0005_category_path_depth"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["name", "id"], name="categories__name_6604b3_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["created_at", "id"], name="categories__created_574831_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["updated_at", "id"], name="categories__updated_10fe99_idx"
+            ),
+        ),
+    ]
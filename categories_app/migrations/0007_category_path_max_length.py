@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("categories_app", "0006_category_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=768
+            ),
+        ),
+    ]
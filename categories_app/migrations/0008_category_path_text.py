@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+_PATH_INDEX_NAME = "categories_app_category_path_idx"
+# The longest indexable utf8mb4 prefix in InnoDB (3072 bytes), about 150 levels of 4-digit ids.
+# The subtree range scan still uses the index for longer paths, and checks the rest on the rows.
+_PATH_INDEX_PREFIX_LENGTH = 768
+
+
+def create_path_index(apps, schema_editor):
+    """
+    Indexes the path, only a prefix of it on MySQL/MariaDB, which cannot index a whole TEXT column.
+    Django indexes do not support prefix lengths, hence the SQL.
+    """
+    Category = apps.get_model("categories_app", "Category")
+    column = schema_editor.quote_name("path")
+    if schema_editor.connection.vendor == "mysql":
+        column = f"{column}({_PATH_INDEX_PREFIX_LENGTH})"
+
+    schema_editor.execute(
+        f"CREATE INDEX {schema_editor.quote_name(_PATH_INDEX_NAME)} "
+        f"ON {schema_editor.quote_name(Category._meta.db_table)} ({column})"
+    )
+
+
+def drop_path_index(apps, schema_editor):
+    Category = apps.get_model("categories_app", "Category")
+    schema_editor.execute(
+        schema_editor.sql_delete_index
+        % {
+            "name": schema_editor.quote_name(_PATH_INDEX_NAME),
+            "table": schema_editor.quote_name(Category._meta.db_table),
+        }
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("categories_app", "0007_category_path_max_length"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="path",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.RunPython(create_path_index, drop_path_index),
+    ]
@@ -1,4 +1,41 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Prefetch, Value
+from django.db.models.functions import Concat, Substr
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_similar_to(self) -> "CategoryQuerySet":
+        """
+        Prefetches the ids of the similar categories in one query,
+        instead of one query per category when serializing similar_to.
+        """
+        return self.prefetch_related(
+            Prefetch("similar_to", queryset=Category.objects.only("id").order_by("id"))
+        )
+
+    def subtree(self, path: str, max_depth: int | None = None) -> "CategoryQuerySet":
+        """
+        The category with the given path and its descendants,
+        at most `max_depth` levels below it.
+        """
+        # Paths only contain digits and "/", and "0" comes right after "/" in ASCII.
+        # So the subtree is an indexed range scan rather than a LIKE pattern.
+        queryset = self.filter(path__gte=path, path__lt=path[:-1] + "0")
+
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lte=_path_depth(path) + max_depth)
+
+        return queryset
+
+    def rebase_paths(self, old_path: str, new_path: str) -> int:
+        """
+        Replaces the `old_path` prefix of the paths with `new_path`,
+        i.e. moves the categories from under one path to under another.
+        """
+        return self.update(
+            path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+            depth=F("depth") + _path_depth(new_path) - _path_depth(old_path),
+        )
 
 
 class Category(models.Model):
@@ -19,6 +56,13 @@ class Category(models.Model):
         related_name="children",
     )
 
+    # Materialized path - the ids from the top-level category down to this one, e.g. "1/5/12/".
+    # Kept in sync with parent on save, so ancestor/depth filters can be indexed SQL predicates.
+    # A TEXT column, so categories can be nested arbitrarily deep. InnoDB only indexes a prefix of it,
+    # so the index is created by migration 0008, on the first 768 characters (3072 bytes in utf8mb4).
+    path = models.TextField(editable=False, default="")
+    depth = models.PositiveIntegerField(db_index=True, editable=False, default=0)
+
     # A category can be similar to multiple other categories.
     # Symmetry - automatically reflected in the db by Django, A~B implies B~A.
     # Transitiveness - not enforced, if A~B and B~C, A~C may or may not be true.
@@ -28,8 +72,65 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"Category {self.id} ({self.name})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        category = super().from_db(db, field_names, values)
+        # The parent as loaded, so post_save can tell whether a save moved the category.
+        if "parent_id" in category.__dict__:
+            category._loaded_parent_id = category.parent_id
+        return category
+
+    @property
+    def parent_path(self) -> str:
+        return self.path[: -len(f"{self.pk}/")]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parent" not in update_fields:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._sync_path()
+
+    def _sync_path(self) -> None:
+        # Read the paths from the db, the in-memory ones may be stale.
+        paths = dict(
+            Category.objects.filter(pk__in=[self.pk, self.parent_id]).values_list(
+                "pk", "path"
+            )
+        )
+        old_path = paths[self.pk]
+        new_path = f"{paths.get(self.parent_id, '')}{self.pk}/"
+        if new_path == old_path:
+            return
+
+        if old_path:
+            Category.objects.subtree(old_path).rebase_paths(old_path, new_path)
+        else:
+            Category.objects.filter(pk=self.pk).update(
+                path=new_path, depth=_path_depth(new_path)
+            )
+
+        self.path = new_path
+        self.depth = _path_depth(new_path)
+
     class Meta:
         verbose_name_plural = "categories"
+        # Keyset pagination orders by (field, id).
+        # The parent_id foreign key index already covers (parent, id) in InnoDB,
+        # where secondary indexes end with the primary key.
+        indexes = [
+            models.Index(fields=["name", "id"]),
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
+
+def _path_depth(path: str) -> int:
+    return path.count("/") - 1
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from categories_app.lib.category_cache import (
+    bump_categories_version,
+    update_category_tree,
+)
+from categories_app.models import Category
+
+# Keeps the cached category tree and the categories version in sync with every write of a category,
+# whether it comes from the API, the admin, the shell or a management command.
+# Set-based writes (QuerySet.update, bulk_create, bulk_update) send no signals,
+# so the code that writes categories that way invalidates the caches itself.
+
+# The parent of a category that was not loaded from the db, or without its parent.
+_UNKNOWN_PARENT = object()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance: Category, created: bool, **kwargs) -> None:
+    # A copy, as the instance may change again before the transaction commits.
+    category = Category(id=instance.id, parent_id=instance.parent_id)
+    if created:
+        update_category_tree(lambda tree: tree.insert(category))
+    elif instance.parent_id != getattr(instance, "_loaded_parent_id", _UNKNOWN_PARENT):
+        update_category_tree(lambda tree: tree.reparent(category))
+    instance._loaded_parent_id = instance.parent_id
+
+    transaction.on_commit(bump_categories_version)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance: Category, origin=None, **kwargs) -> None:
+    if not isinstance(origin, QuerySet):
+        category_id = instance.id
+        update_category_tree(lambda tree: tree.delete(category_id))
+        transaction.on_commit(bump_categories_version)
+        return
+
+    # A QuerySet.delete() sends a signal per row, the rows are removed from the tree at once.
+    # The delta runs on commit, when the ids of all the rows are collected.
+    deleted_ids: list[int] | None = getattr(origin, "_deleted_category_ids", None)
+    if deleted_ids is None:
+        deleted_ids = origin._deleted_category_ids = []
+        update_category_tree(lambda tree: tree.delete_many(deleted_ids))
+        transaction.on_commit(bump_categories_version)
+    deleted_ids.append(instance.id)
+
+
+@receiver(m2m_changed, sender=Category.similar_to.through)
+def similar_to_changed(sender, action: str, **kwargs) -> None:
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(bump_categories_version)
@@ -1,7 +1,10 @@
 import pytest
 from rest_framework.exceptions import ValidationError
 from categories_app.models import Category
+from categories_app.api.renderers import render_json
 from categories_app.api.serializers import (
+    CategoryBulkSerializer,
+    CategoryReadSerializer,
     CategorySerializer,
     CategorySimilarityAddSerializer,
 )
@@ -42,6 +45,93 @@ class TestCategorySerializer:
         with pytest.raises(ValidationError):
             serializer.is_valid(raise_exception=True)
 
+    def test_validate_deep_cycle_detection_in_one_query(
+        self, django_assert_num_queries
+    ):
+        root = Category.objects.create(name="Root")
+        leaf = root
+        for i in range(50):
+            leaf = Category.objects.create(name=f"Level {i}", parent=leaf)
+        serializer = CategorySerializer(root, data={"parent": leaf.id}, partial=True)
+
+        # One query to look up the new parent, one for the cycle check.
+        with django_assert_num_queries(2):
+            assert not serializer.is_valid()
+        assert "would create a cycle" in str(serializer.errors)
+
+
+@pytest.mark.django_db
+class TestCategoryReadSerializer:
+    def test_same_output_as_category_serializer(self, categories):
+        queryset = Category.objects.order_by("id")
+        rows = list(CategoryReadSerializer.values(queryset))
+
+        expected = CategorySerializer(queryset.with_similar_to(), many=True).data
+        assert render_json(CategoryReadSerializer(rows).data) == render_json(expected)
+
+    def test_similar_to(self, categories):
+        rows = list(
+            CategoryReadSerializer.values(
+                Category.objects.filter(id=categories["Computers"].id)
+            )
+        )
+
+        data = CategoryReadSerializer(rows).data
+        assert data[0]["similar_to"] == sorted(
+            categories[name].id for name in ["Laptops", "Desktops", "Books"]
+        )
+
+    def test_no_rows(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert CategoryReadSerializer([]).data == []
+
+    def test_fields(self, categories, django_assert_num_queries):
+        fields = ["parent", "name", "created_at"]
+        queryset = Category.objects.filter(id=categories["Laptops"].id)
+        rows = list(CategoryReadSerializer.values(queryset, fields))
+
+        with django_assert_num_queries(0):
+            data = CategoryReadSerializer(rows, fields).data
+
+        assert list(data[0]) == ["name", "parent", "created_at"]
+        assert data[0]["parent"] == categories["Computers"].id
+        assert "description" not in rows[0]
+
+
+@pytest.mark.django_db
+class TestCategoryBulkSerializer:
+    def test_save_validates_parents_again(self, categories):
+        audio, books = categories["Audio"], categories["Books"]
+        serializer = CategoryBulkSerializer(
+            data={"categories": [{"id": audio.id, "parent": books.id}]}
+        )
+        assert serializer.is_valid()
+
+        # A write between the validation and the save, that the batch now closes a cycle with.
+        books.parent = categories["Headphones"]
+        books.save()
+
+        with pytest.raises(ValidationError, match="cycle"):
+            serializer.save()
+        assert Category.objects.get(pk=audio.id).parent_id == audio.parent_id
+
+    def test_save_writes_paths_of_moved_subtrees(self, categories):
+        books, audio = categories["Books"], categories["Audio"]
+        serializer = CategoryBulkSerializer(
+            data={
+                "categories": [
+                    {"ref": "new", "name": "New", "parent": books.id},
+                    {"id": audio.id, "parent_ref": "new"},
+                ]
+            }
+        )
+        assert serializer.is_valid()
+        new_id, _ = serializer.save()
+
+        headphones = Category.objects.get(pk=categories["Headphones"].id)
+        assert headphones.path == f"{books.id}/{new_id}/{audio.id}/{headphones.id}/"
+        assert headphones.depth == 3
+
 
 class TestCategorySimilarityAddSerializer:
     def test_valid_data(self):
@@ -19,6 +19,19 @@ class TestCategorySimilarityViewSet:
         assert "Computers" in returned_category_names
         assert "Desktops" in returned_category_names
 
+    def test_list_similarities_constant_number_of_queries(
+        self, categories, django_assert_num_queries
+    ):
+        tech = categories["Tech"]
+        similar = [Category.objects.create(name=f"Similar {i}") for i in range(20)]
+        tech.similar_to.add(*similar)
+        similar[0].similar_to.add(*similar[1:])
+
+        with django_assert_num_queries(3):
+            response = self.client.get(f"/api/categories/{tech.id}/similarities/")
+        assert response.status_code == 200
+        assert len(response.data) == 20
+
     def test_create_similarity_symmetric(self, categories):
         response = self.client.post(
             f"/api/categories/{categories['Tech'].id}/similarities/",
@@ -56,3 +69,61 @@ class TestCategorySimilarityViewSet:
         categories["Laptops"].refresh_from_db()
         assert categories["Laptops"] not in categories["Desktops"].similar_to.all()
         assert categories["Desktops"] not in categories["Laptops"].similar_to.all()
+
+
+@pytest.mark.django_db
+class TestCategorySimilarityBulk:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_add_and_remove(self, categories):
+        books, food, tech = categories["Books"], categories["Food"], categories["Tech"]
+
+        response = self.client.post(
+            "/api/categories/similarities/",
+            {
+                "add": [[books.id, food.id], [food.id, books.id], [tech.id, food.id]],
+                "remove": [[categories["Computers"].id, books.id]],
+            },
+            format="json",
+        )
+
+        assert response.status_code == 204
+        assert set(food.similar_to.values_list("id", flat=True)) == {books.id, tech.id}
+        assert list(books.similar_to.values_list("id", flat=True)) == [food.id]
+        assert not categories["Computers"].similar_to.filter(pk=books.id).exists()
+
+    def test_add_existing_pair(self, categories):
+        laptops, desktops = categories["Laptops"], categories["Desktops"]
+
+        response = self.client.post(
+            "/api/categories/similarities/",
+            {"add": [[desktops.id, laptops.id]]},
+            format="json",
+        )
+
+        assert response.status_code == 204
+        assert laptops.similar_to.filter(pk=desktops.id).count() == 1
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"add": [["books", "books"]]},
+            {"add": [["books", 999]]},
+            {"add": [["books", "food"]], "remove": [["food", "books"]]},
+            {"add": [["books"]]},
+        ],
+    )
+    def test_invalid(self, categories, data):
+        ids = {name: categories[name.capitalize()].id for name in ["books", "food"]}
+        data = {
+            key: [[ids.get(id, id) for id in pair] for pair in pairs]
+            for key, pairs in data.items()
+        }
+
+        response = self.client.post(
+            "/api/categories/similarities/", data, format="json"
+        )
+
+        assert response.status_code == 400
+        assert not categories["Books"].similar_to.filter(pk=ids["food"]).exists()
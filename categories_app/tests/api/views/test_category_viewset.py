@@ -1,6 +1,20 @@
+import base64
+import json
+import pickle
+from unittest import mock
+
 import pytest
+from django.core.cache import cache
+from django.utils import timezone
 from rest_framework.test import APIClient
 from categories_app.models import Category
+from categories_app.api.views.category_viewset import CategoryViewSet
+from categories_app.lib.category_cache import (
+    _update_tree,
+    get_category_name_index,
+    get_category_tree,
+)
+from categories_app.lib.category_tree import CategoryTree
 
 
 @pytest.mark.django_db
@@ -111,6 +125,566 @@ class TestCategoryViewSetList:
         ] == returned_category_names[:3]
 
 
+@pytest.mark.django_db
+class TestCategoryViewSetPagination:
+    def setup_method(self):
+        self.client = APIClient()
+
+    @pytest.mark.parametrize(
+        "order_by",
+        ["name", "-name", "parent", "-parent", "created_at", "-updated_at"],
+    )
+    def test_pages_cover_ordered_list(self, categories, order_by):
+        Category.objects.create(name="Tech")  # duplicate name, ordered by id
+
+        expected = self.client.get(f"/api/categories/?order_by={order_by}").data
+        returned = []
+        url = f"/api/categories/?order_by={order_by}&page_size=4"
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == 200
+            assert len(response.data["results"]) <= 4
+            returned += response.data["results"]
+            url = response.data["next"]
+
+        assert [cat["id"] for cat in returned] == [cat["id"] for cat in expected]
+
+    def test_pages_with_tree_filters(self, categories):
+        response = self.client.get(
+            f"/api/categories/?ancestor_id={categories['Tech'].id}&max_depth=2"
+            "&order_by=name&page_size=5"
+        )
+        assert response.status_code == 200
+        assert [cat["name"] for cat in response.data["results"]] == [
+            "Audio",
+            "Computers",
+            "Desktops",
+            "Headphones",
+            "Laptops",
+        ]
+
+        response = self.client.get(response.data["next"])
+        assert [cat["name"] for cat in response.data["results"]] == ["Tech"]
+        assert response.data["next"] is None
+
+    def test_page_size_invalid(self, categories):
+        response = self.client.get("/api/categories/?page_size=0")
+        assert response.status_code == 400
+        assert "page_size" in str(response.data)
+
+    def test_cursor_invalid(self, categories):
+        response = self.client.get("/api/categories/?page_size=2&cursor=nope")
+        assert response.status_code == 400
+        assert "cursor" in str(response.data)
+
+    @pytest.mark.parametrize(
+        "order_by, cursor",
+        [
+            ("parent", ["abc", 1]),
+            ("parent", [1.5, 1]),
+            ("name", [1, 1]),
+            ("created_at", [None, 1]),
+            ("created_at", ["yesterday", 1]),
+            ("", [None, True]),
+            ("", [None, 2**64]),
+            ("name", ["a", 1, 2]),
+            ("name", {"a": 1}),
+        ],
+    )
+    def test_cursor_crafted(self, categories, order_by, cursor):
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+        response = self.client.get(
+            f"/api/categories/?order_by={order_by}&page_size=2&cursor={encoded}"
+        )
+
+        assert response.status_code == 400
+        assert "cursor" in str(response.data)
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetStreaming:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_stream_json(self, categories):
+        expected = self.client.get("/api/categories/?order_by=name")
+
+        response = self.client.get("/api/categories/?order_by=name&stream=1")
+        assert response.status_code == 200
+        assert response.streaming
+        assert b"".join(response.streaming_content) == expected.content
+
+    @pytest.mark.parametrize("order_by", ["parent", "-name", "-created_at"])
+    def test_stream_in_keyset_chunks(
+        self, categories, order_by, monkeypatch, django_assert_num_queries
+    ):
+        monkeypatch.setattr(CategoryViewSet, "_stream_chunk_size", 5)
+        expected = self.client.get(f"/api/categories/?order_by={order_by}")
+
+        response = self.client.get(
+            f"/api/categories/?order_by={order_by}&stream=1&fields=id,name,parent"
+        )
+        # One query per chunk, the last one short.
+        with django_assert_num_queries(len(categories) // 5 + 1):
+            content = b"".join(response.streaming_content)
+
+        assert json.loads(content) == [
+            {field: c[field] for field in ("id", "name", "parent")}
+            for c in expected.data
+        ]
+
+    def test_stream_ndjson(self, categories):
+        url = f"/api/categories/?ancestor_id={categories['Computers'].id}"
+        expected = self.client.get(url).data
+
+        response = self.client.get(url, HTTP_ACCEPT="application/x-ndjson")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(response.streaming_content).splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+    def test_stream_empty(self, categories):
+        response = self.client.get("/api/categories/?name=nothing&stream=1")
+        assert b"".join(response.streaming_content) == b"[]"
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetAutocomplete:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_autocomplete(self, categories):
+        response = self.client.get("/api/categories/autocomplete/?prefix=w")
+
+        assert response.status_code == 200
+        assert response.data == [
+            {
+                "id": categories["Wireless headphones"].id,
+                "name": "Wireless headphones",
+            }
+        ]
+
+    def test_autocomplete_ordered_and_limited(self, categories):
+        response = self.client.get("/api/categories/autocomplete/?prefix=&limit=3")
+
+        assert [c["name"] for c in response.data] == ["Audio", "Books", "Computers"]
+
+    def test_autocomplete_by_ancestor(self, categories):
+        response = self.client.get(
+            f"/api/categories/autocomplete/?prefix=&ancestor_id={categories['Audio'].id}"
+        )
+
+        assert [c["name"] for c in response.data] == [
+            "Audio",
+            "Headphones",
+            "In-ear wireless headphones",
+            "Over-ear wireless headphones",
+            "Wireless headphones",
+        ]
+
+    def test_autocomplete_without_db_queries(
+        self, categories, django_assert_num_queries
+    ):
+        self.client.get("/api/categories/autocomplete/?prefix=t&ancestor_id=1")
+
+        with django_assert_num_queries(0):
+            response = self.client.get(
+                f"/api/categories/autocomplete/?prefix=t&ancestor_id={categories['Tech'].id}"
+            )
+        assert [c["name"] for c in response.data] == ["Tech"]
+
+    def test_autocomplete_invalid_limit(self, categories):
+        response = self.client.get("/api/categories/autocomplete/?prefix=a&limit=0")
+
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetBatch:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_batch(self, categories, django_assert_num_queries):
+        ids = [categories[name].id for name in ["Laptops", "Tech", "Books"]]
+
+        with django_assert_num_queries(2):
+            response = self.client.get(
+                f"/api/categories/batch/?ids={ids[0]},999,{ids[1]},{ids[2]},{ids[0]}"
+            )
+
+        assert response.status_code == 200
+        assert [c["name"] for c in response.data["results"]] == [
+            "Laptops",
+            "Tech",
+            "Books",
+        ]
+        assert response.data["results"][0]["similar_to"] == sorted(
+            [categories["Computers"].id, categories["Desktops"].id]
+        )
+        assert response.data["missing"] == [999]
+
+    def test_batch_fields(self, categories):
+        ids = [categories["Books"].id, categories["Food"].id]
+
+        response = self.client.get(
+            f"/api/categories/batch/?ids={ids[1]},{ids[0]}&fields=name"
+        )
+
+        assert response.data["results"] == [{"name": "Food"}, {"name": "Books"}]
+
+    @pytest.mark.parametrize(
+        "ids", ["", "1,a", "0", ",".join(map(str, range(1, 1002)))]
+    )
+    def test_batch_invalid_ids(self, categories, ids):
+        response = self.client.get(f"/api/categories/batch/?ids={ids}")
+
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetAncestors:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_ancestors(self, categories, django_assert_num_queries):
+        self.client.get(f"/api/categories/{categories['Tech'].id}/ancestors/")
+
+        with django_assert_num_queries(0):
+            response = self.client.get(
+                f"/api/categories/{categories['Laptops'].id}/ancestors/"
+            )
+
+        assert response.status_code == 200
+        assert response.data == [
+            {"id": categories[name].id, "name": name}
+            for name in ["Tech", "Computers", "Laptops"]
+        ]
+
+    def test_ancestors_not_found(self, categories):
+        response = self.client.get("/api/categories/999/ancestors/")
+
+        assert response.status_code == 404
+
+    def test_bulk_ancestors(self, categories):
+        ids = [categories["Potatoes"].id, 999, categories["Food"].id]
+
+        response = self.client.get(
+            f"/api/categories/ancestors/?ids={','.join(map(str, ids))}"
+        )
+
+        assert response.status_code == 200
+        assert [
+            (result["id"], [c["name"] for c in result["ancestors"]])
+            for result in response.data["results"]
+        ] == [
+            (ids[0], ["Food", "Fresh produce", "Vegetables", "Potatoes"]),
+            (ids[2], ["Food"]),
+        ]
+        assert response.data["missing"] == [999]
+
+    def test_ancestors_name_missing_from_name_index(self, categories):
+        get_category_name_index()
+        cache.delete("category_tree")
+        category = Category.objects.create(name="Unindexed", parent=categories["Books"])
+
+        response = self.client.get(f"/api/categories/{category.id}/ancestors/")
+
+        assert [c["name"] for c in response.data] == ["Books", "Unindexed"]
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetNestedTree:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_tree(self, categories):
+        response = self.client.get(
+            f"/api/categories/{categories['Audio'].id}/tree/?fields=name"
+        )
+
+        assert response.status_code == 200
+        assert response.data == {
+            "name": "Audio",
+            "children": [
+                {
+                    "name": "Headphones",
+                    "children": [
+                        {
+                            "name": "Wireless headphones",
+                            "children": [
+                                {"name": "In-ear wireless headphones", "children": []},
+                                {
+                                    "name": "Over-ear wireless headphones",
+                                    "children": [],
+                                },
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+
+    def test_tree_max_depth(self, categories, django_assert_num_queries):
+        url = f"/api/categories/{categories['Tech'].id}/tree/?max_depth=1"
+        self.client.get(url + "&fields=id")
+
+        # The rows and their similar_to.
+        with django_assert_num_queries(2):
+            response = self.client.get(url)
+
+        assert response.data["id"] == categories["Tech"].id
+        assert response.data["description"] == "All things tech"
+        assert [c["name"] for c in response.data["children"]] == ["Computers", "Audio"]
+        assert all(c["children"] == [] for c in response.data["children"])
+
+    def test_tree_not_found(self, categories):
+        response = self.client.get("/api/categories/999/tree/")
+
+        assert response.status_code == 404
+
+    def test_tree_invalid_max_depth(self, categories):
+        response = self.client.get(
+            f"/api/categories/{categories['Tech'].id}/tree/?max_depth=-1"
+        )
+
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetConditionalGet:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_list_not_modified(self, categories, django_assert_num_queries):
+        response = self.client.get("/api/categories/?name=p")
+        etag = response.headers["ETag"]
+
+        with django_assert_num_queries(0):
+            response = self.client.get(
+                "/api/categories/?name=p", HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    def test_list_etag_depends_on_query_params(self, categories):
+        etag = self.client.get("/api/categories/?name=p").headers["ETag"]
+
+        response = self.client.get("/api/categories/?name=ph", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_list_etag_changes_on_write(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        etag = self.client.get("/api/categories/").headers["ETag"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.client.patch(
+                f"/api/categories/{categories['Tech'].id}/", {"name": "IT"}
+            )
+
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_retrieve_not_modified(self, categories):
+        url = f"/api/categories/{categories['Tech'].id}/"
+        response = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response.headers["ETag"])
+        assert response.status_code == 304
+
+    def test_retrieve_etag_changes_on_orm_write(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        tech = categories["Tech"]
+        url = f"/api/categories/{tech.id}/"
+        etag = self.client.get(url).headers["ETag"]
+        self.client.get("/api/categories/")
+
+        # As in the admin or the shell, bypassing the API views.
+        with django_capture_on_commit_callbacks(execute=True):
+            tech.name = "IT"
+            tech.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["name"] == "IT"
+        response = self.client.get("/api/categories/")
+        assert "IT" in [c["name"] for c in response.data]
+
+    def test_retrieve_etag_changes_with_updated_at(self, categories):
+        url = f"/api/categories/{categories['Tech'].id}/"
+        etag = self.client.get(url).headers["ETag"]
+
+        # A set-based write, which sends no signals and so leaves the version as it is.
+        Category.objects.filter(pk=categories["Tech"].id).update(
+            name="IT", updated_at=timezone.now()
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data["name"] == "IT"
+
+    def test_retrieve_if_none_match_any(self, categories):
+        response = self.client.get(
+            f"/api/categories/{categories['Tech'].id}/", HTTP_IF_NONE_MATCH="*"
+        )
+        assert response.status_code == 304
+
+        response = self.client.get("/api/categories/999/", HTTP_IF_NONE_MATCH="*")
+        assert response.status_code == 404
+
+    def test_retrieve_if_modified_since(self, categories):
+        url = f"/api/categories/{categories['Books'].id}/"
+        last_modified = self.client.get(url).headers["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT"
+        )
+        assert response.status_code == 200
+
+    def test_similarity_change_touches_updated_at(self, categories):
+        books = categories["Books"]
+
+        self.client.post(
+            f"/api/categories/{books.id}/similarities/", {"id": categories["Food"].id}
+        )
+
+        books_updated_at = Category.objects.get(pk=books.id).updated_at
+        assert books_updated_at > books.updated_at
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetFields:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_list_fields(self, categories, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = self.client.get(
+                "/api/categories/?fields=name,id,parent&order_by=-created_at"
+            )
+
+        assert response.status_code == 200
+        assert response.data[0] == {
+            "id": categories["Books"].id,
+            "name": "Books",
+            "parent": None,
+        }
+
+    def test_paginated_list_fields(self, categories):
+        response = self.client.get(
+            "/api/categories/?fields=name&order_by=parent&page_size=2"
+        )
+        assert all(list(c) == ["name"] for c in response.data["results"])
+
+        response = self.client.get(response.data["next"])
+        assert response.status_code == 200
+        assert len(response.data["results"]) == 2
+
+    def test_streamed_list_fields(self, categories):
+        response = self.client.get("/api/categories/?fields=id,similar_to&stream=1")
+
+        data = json.loads(b"".join(response.streaming_content))
+        assert len(data) == len(categories)
+        assert all(list(c) == ["id", "similar_to"] for c in data)
+
+    def test_retrieve_fields(self, categories):
+        response = self.client.get(
+            f"/api/categories/{categories['Laptops'].id}/?fields=similar_to"
+        )
+
+        assert response.data == {
+            "similar_to": [categories["Computers"].id, categories["Desktops"].id]
+        }
+
+    def test_invalid_fields(self, categories):
+        response = self.client.get("/api/categories/?fields=name,image")
+
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("fields", ["%20,", ",,"])
+    def test_empty_fields(self, categories, fields):
+        response = self.client.get(f"/api/categories/?fields={fields}")
+        assert response.status_code == 400
+        assert "fields" in str(response.data)
+
+        response = self.client.get(
+            f"/api/categories/{categories['Tech'].id}/?fields={fields}"
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetListCache:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_repeated_query_is_cached(self, categories, django_assert_num_queries):
+        tech_id = categories["Tech"].id
+        response = self.client.get(
+            f"/api/categories/?ancestor_id={tech_id}&max_depth=1"
+        )
+
+        with django_assert_num_queries(0):
+            cached_response = self.client.get(
+                f"/api/categories/?max_depth=1&ancestor_id={tech_id}"
+            )
+        assert cached_response.data == response.data
+
+    def test_cached_next_link_keeps_format(self, categories):
+        self.client.get("/api/categories/?page_size=2&format=json")
+
+        response = self.client.get("/api/categories/?page_size=2&format=api")
+        assert "format=api" in response.data["next"]
+
+    def test_write_invalidates_cached_lists(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        self.client.get("/api/categories/?page_size=2&order_by=name")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.client.patch(
+                f"/api/categories/{categories['Audio'].id}/", {"name": "Sound"}
+            )
+
+        response = self.client.get("/api/categories/?page_size=2&order_by=name")
+        assert [c["name"] for c in response.data["results"]] == ["Books", "Computers"]
+        response = self.client.get("/api/categories/?name=sound")
+        assert [c["id"] for c in response.data] == [categories["Audio"].id]
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetListQueries:
+    def setup_method(self):
+        self.client = APIClient()
+
+    @pytest.mark.parametrize(
+        "query, num_queries",
+        [
+            ("", 2),
+            ("?page_size=5", 2),
+            ("?stream=1", 2),
+            ("?ancestor_id={tech_id}", 3),
+        ],
+    )
+    def test_constant_number_of_queries(
+        self, categories, django_assert_num_queries, query, num_queries
+    ):
+        _create_similar_categories(categories["Tech"], 20)
+        url = "/api/categories/" + query.format(tech_id=categories["Tech"].id)
+
+        with django_assert_num_queries(num_queries):
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        assert response.status_code == 200
+
+
 @pytest.mark.django_db
 class TestCategoryViewSet:
     def setup_method(self):
@@ -166,3 +740,360 @@ class TestCategoryViewSet:
         desktops.refresh_from_db()
         assert laptops.parent_id == computers.parent_id
         assert desktops.parent_id == computers.parent_id
+
+    def test_destroy_category_rebases_descendant_paths(self, categories):
+        response = self.client.delete(f"/api/categories/{categories['Audio'].id}/")
+        assert response.status_code == 204
+
+        response = self.client.get(
+            f"/api/categories/?ancestor_id={categories['Tech'].id}&max_depth=2"
+        )
+        returned_category_names = {cat["name"] for cat in response.data}
+        assert "Wireless headphones" in returned_category_names
+        assert "In-ear wireless headphones" not in returned_category_names
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetBulk:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_bulk_create_and_update(self, categories):
+        books = categories["Books"]
+        response = self.client.post(
+            "/api/categories/bulk/",
+            {
+                "categories": [
+                    {"ref": "novels", "name": "Novels", "parent": books.id},
+                    {"ref": "sci-fi", "name": "Sci-fi", "parent_ref": "novels"},
+                    {"id": categories["Food"].id, "parent_ref": "sci-fi"},
+                    {"id": categories["Laptops"].id, "name": "Notebooks"},
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert [c["name"] for c in response.data] == [
+            "Novels",
+            "Sci-fi",
+            "Food",
+            "Notebooks",
+        ]
+        novels_id, sci_fi_id = response.data[0]["id"], response.data[1]["id"]
+        assert response.data[1]["parent"] == novels_id
+        assert response.data[2]["parent"] == sci_fi_id
+        assert response.data[3]["parent"] == categories["Computers"].id
+
+        potatoes = Category.objects.get(pk=categories["Potatoes"].id)
+        assert potatoes.path.startswith(f"{books.id}/{novels_id}/{sci_fi_id}/")
+        assert potatoes.depth == 6
+
+    def test_bulk_invalidates_cached_tree(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        get_category_tree()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                "/api/categories/bulk/",
+                {
+                    "categories": [
+                        {"ref": "a", "name": "A"},
+                        {"name": "B", "parent_ref": "a"},
+                    ]
+                },
+                format="json",
+            )
+        assert response.status_code == 200
+        assert cache.get("category_tree") is None
+        assert get_category_tree().depth(response.data[1]["id"]) == 1
+
+    def test_bulk_nests_arbitrarily_deep(self, categories):
+        items = [{"ref": "0", "name": "Level 0"}] + [
+            {"ref": str(i), "name": f"Level {i}", "parent_ref": str(i - 1)}
+            for i in range(1, 400)
+        ]
+
+        response = self.client.post(
+            "/api/categories/bulk/", {"categories": items}, format="json"
+        )
+        assert response.status_code == 200
+        top_id, deepest_id = response.data[0]["id"], response.data[-1]["id"]
+
+        response = self.client.post(
+            "/api/categories/", {"name": "Leaf", "parent": deepest_id}, format="json"
+        )
+        assert response.status_code == 201
+        leaf = Category.objects.get(pk=response.data["id"])
+        assert leaf.depth == 400
+        assert len(leaf.path) > 768
+
+        response = self.client.post(
+            f"/api/categories/{top_id}/move/",
+            {"parent": categories["Books"].id},
+            format="json",
+        )
+        assert response.status_code == 200
+        assert Category.objects.get(pk=leaf.id).depth == 401
+
+        response = self.client.get(f"/api/categories/?ancestor_id={top_id}")
+        assert len(response.data) == 401
+
+    def test_bulk_rejects_cycle(self, categories):
+        response = self.client.post(
+            "/api/categories/bulk/",
+            {
+                "categories": [
+                    {
+                        "ref": "new",
+                        "name": "New",
+                        "parent": categories["Headphones"].id,
+                    },
+                    {"id": categories["Audio"].id, "parent_ref": "new"},
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert Category.objects.count() == len(categories)
+
+    @pytest.mark.parametrize(
+        "items",
+        [
+            [{"name": "A", "parent_ref": "missing"}],
+            [{"ref": "a", "name": "A"}, {"ref": "a", "name": "B"}],
+            [{"id": 999, "name": "A"}],
+            [{"name": "A", "parent": 999}],
+            [{"ref": "a"}],
+        ],
+    )
+    def test_bulk_invalid(self, categories, items):
+        response = self.client.post(
+            "/api/categories/bulk/", {"categories": items}, format="json"
+        )
+
+        assert response.status_code == 400
+        assert Category.objects.count() == len(categories)
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetSubtree:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_move(
+        self,
+        categories,
+        django_assert_max_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        get_category_tree()
+        audio = categories["Audio"]
+
+        # Independent of the size of the subtree, savepoints included.
+        with (
+            django_assert_max_num_queries(11),
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            response = self.client.post(
+                f"/api/categories/{audio.id}/move/",
+                {"parent": categories["Books"].id},
+                format="json",
+            )
+
+        assert response.status_code == 200
+        assert response.data["parent"] == categories["Books"].id
+        in_ear = Category.objects.get(pk=categories["In-ear wireless headphones"].id)
+        assert in_ear.path.startswith(f"{categories['Books'].id}/{audio.id}/")
+        assert _cached_tree().depth(in_ear.id) == 4
+
+    def test_move_to_top_level(self, categories):
+        response = self.client.post(
+            f"/api/categories/{categories['Audio'].id}/move/",
+            {"parent": None},
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert Category.objects.get(pk=categories["Headphones"].id).depth == 1
+
+    def test_move_under_descendant(self, categories):
+        response = self.client.post(
+            f"/api/categories/{categories['Audio'].id}/move/",
+            {"parent": categories["Wireless headphones"].id},
+            format="json",
+        )
+
+        assert response.status_code == 400
+
+    def test_move_without_parent(self, categories):
+        response = self.client.post(
+            f"/api/categories/{categories['Audio'].id}/move/", {}, format="json"
+        )
+
+        assert response.status_code == 400
+
+    def test_delete_subtree(self, categories, django_capture_on_commit_callbacks):
+        get_category_tree()
+        computers = categories["Computers"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.delete(f"/api/categories/{computers.id}/subtree/")
+
+        assert response.status_code == 204
+        assert not Category.objects.filter(
+            name__in=["Computers", "Laptops", "Desktops"]
+        ).exists()
+        assert Category.objects.count() == len(categories) - 3
+        books = Category.objects.get(pk=categories["Books"].id)
+        assert list(books.similar_to.all()) == []
+        assert books.updated_at > categories["Books"].updated_at
+        assert computers.id not in _cached_tree()
+        assert self.client.get("/api/categories/?name=laptop").data == []
+
+
+@pytest.mark.django_db
+class TestCategoryViewSetTreeCache:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_writes_patch_cached_tree(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        get_category_tree()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                "/api/categories/", {"name": "Novels", "parent": categories["Books"].id}
+            )
+        assert response.status_code == 201
+        novels_id = response.data["id"]
+        assert _cached_tree().depth(novels_id) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.patch(
+                f"/api/categories/{novels_id}/", {"parent": categories["Tech"].id}
+            )
+        assert response.status_code == 200
+        assert _cached_tree().depth(novels_id) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.delete(f"/api/categories/{categories['Tech'].id}/")
+        assert response.status_code == 204
+        tree = _cached_tree()
+        assert categories["Tech"].id not in tree
+        assert tree.depth(novels_id) == 0
+
+    def test_orm_writes_patch_cached_tree(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        get_category_tree()
+        books = categories["Books"]
+
+        # As in the admin or the shell, bypassing the API views.
+        with django_capture_on_commit_callbacks(execute=True):
+            audio = Category.objects.get(pk=categories["Audio"].id)
+            audio.parent = books
+            audio.save()
+            Category.objects.get(pk=categories["Sweet potatoes"].id).delete()
+            novels = Category.objects.create(name="Novels", parent=books)
+
+        tree = _cached_tree()
+        assert tree.parent_id(audio.id) == books.id
+        assert categories["Sweet potatoes"].id not in tree
+        assert tree.parent_id(novels.id) == books.id
+
+    def test_tree_patched_on_commit_only(self, categories):
+        get_category_tree()
+
+        response = self.client.post("/api/categories/", {"name": "Novels"})
+        assert response.status_code == 201
+
+        # The test transaction never commits.
+        assert response.data["id"] not in _cached_tree()
+
+    def test_overlapping_writes_evict_cached_tree(self, categories):
+        get_category_tree()
+        first = Category.objects.create(name="First")
+        second = Category.objects.create(name="Second")
+
+        # Both writes read the cached tree before either stores it back.
+        pickled = pickle.dumps(cache.get("category_tree"))
+        cache_get = cache.get
+
+        def stale_get(key, *args, **kwargs):
+            if key == "category_tree":
+                return pickle.loads(pickled)
+            return cache_get(key, *args, **kwargs)
+
+        with mock.patch.object(cache, "get", stale_get):
+            _update_tree(lambda tree: tree.insert(first))
+            _update_tree(lambda tree: tree.insert(second))
+
+        tree = get_category_tree()
+        assert first.id in tree
+        assert second.id in tree
+
+    def test_out_of_sync_cached_tree_is_rebuilt(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        get_category_tree()
+        orphan = Category.objects.create(name="Orphan")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                "/api/categories/", {"name": "Orphan child", "parent": orphan.id}
+            )
+        assert response.status_code == 201
+        assert cache.get("category_tree") is None
+
+        response = self.client.get(f"/api/categories/?ancestor_id={orphan.id}")
+        assert len(response.data) == 2
+
+    def test_writes_update_name_index(
+        self, categories, django_capture_on_commit_callbacks
+    ):
+        response = self.client.get("/api/categories/?name=novel")
+        assert response.data == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post("/api/categories/", {"name": "Novels"})
+        assert response.status_code == 201
+        novels_id = response.data["id"]
+        response = self.client.get("/api/categories/?name=novel")
+        assert [c["id"] for c in response.data] == [novels_id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.patch(
+                f"/api/categories/{novels_id}/", {"name": "Short stories"}
+            )
+        assert response.status_code == 200
+        assert self.client.get("/api/categories/?name=novel").data == []
+        response = self.client.get("/api/categories/?name=stories")
+        assert [c["id"] for c in response.data] == [novels_id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.delete(f"/api/categories/{novels_id}/")
+        assert response.status_code == 204
+        assert self.client.get("/api/categories/?name=stories").data == []
+
+
+def _cached_tree() -> CategoryTree:
+    """
+    The tree in the cache, which must reflect the last write.
+    """
+    writes, tree = cache.get("category_tree")
+    assert writes == cache.get("category_tree_writes")
+    return tree
+
+
+def _create_similar_categories(parent: Category, count: int) -> list[Category]:
+    similar = [
+        Category.objects.create(name=f"Similar {i}", parent=parent)
+        for i in range(count)
+    ]
+    for a, b in zip(similar, similar[1:]):
+        a.similar_to.add(b)
+    return similar
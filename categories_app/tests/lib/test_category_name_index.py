@@ -0,0 +1,42 @@
+import pytest
+from categories_app.lib.category_name_index import CategoryNameIndex
+
+
+@pytest.mark.django_db
+class TestCategoryNameIndex:
+    def test_search_matches_icontains(self, categories):
+        index = CategoryNameIndex()
+
+        for query in [
+            "p",
+            "PH",
+            "head",
+            "Wireless H",
+            "ear wire",
+            "xyz",
+            "headphonesx",
+        ]:
+            expected = {
+                c.id for name, c in categories.items() if query.lower() in name.lower()
+            }
+            assert index.search(query) == expected, query
+
+    def test_starting_with(self):
+        index = CategoryNameIndex(
+            [(1, "Desktops"), (2, "laptops"), (3, "Laptop bags"), (4, "Lamps")]
+        )
+
+        assert list(index.starting_with("LAPTOP")) == [3, 2]
+        assert list(index.starting_with("la")) == [4, 3, 2]
+        assert list(index.starting_with("z")) == []
+        assert list(index.starting_with("")) == [1, 4, 3, 2]
+        assert index.name(2) == "laptops"
+
+    def test_accent_insensitive(self):
+        index = CategoryNameIndex([(1, "Café"), (2, "Crème brûlée"), (3, "Cafeteria")])
+
+        assert index.search("cafe") == {1, 3}
+        assert index.search("CAFÉ") == {1, 3}
+        assert index.search("brulee") == {2}
+        assert index.search("é") == {1, 2, 3}
+        assert list(index.starting_with("creme")) == [2]
@@ -0,0 +1,14 @@
+import pytest
+from categories_app.models import Category
+from categories_app.lib.category_paths import rebuild_category_paths
+
+
+@pytest.mark.django_db
+class TestRebuildCategoryPaths:
+    def test_backfill(self, categories):
+        expected = dict(Category.objects.values_list("id", "path"))
+        Category.objects.update(path="", depth=0)
+
+        assert rebuild_category_paths() == len(categories)
+        assert dict(Category.objects.values_list("id", "path")) == expected
+        assert rebuild_category_paths() == 0
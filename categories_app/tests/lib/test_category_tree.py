@@ -0,0 +1,181 @@
+import pickle
+
+import pytest
+from categories_app.models import Category
+from categories_app.lib.category_tree import CategoryTree
+
+
+@pytest.mark.django_db
+class TestCategoryTree:
+    def test_depths(self, categories):
+        tree = CategoryTree()
+
+        assert tree.depth(categories["Tech"].id) == 0
+        assert tree.depth(categories["Computers"].id) == 1
+        assert tree.depth(categories["In-ear wireless headphones"].id) == 4
+
+    def test_is_descendant(self, categories):
+        tree = CategoryTree()
+        tech = categories["Tech"].id
+        wireless = categories["Wireless headphones"].id
+
+        assert tree.is_descendant(wireless, tech)
+        assert tree.is_descendant(tech, tech, max_depth=0)
+        assert tree.is_descendant(wireless, tech, max_depth=3)
+        assert not tree.is_descendant(wireless, tech, max_depth=2)
+        assert not tree.is_descendant(tech, wireless)
+        assert not tree.is_descendant(wireless, categories["Food"].id)
+        assert not tree.is_descendant(wireless, 999)
+
+    def test_descendants(self, categories):
+        tree = CategoryTree()
+        names_by_id = {c.id: name for name, c in categories.items()}
+
+        descendants = tree.descendants(categories["Audio"].id)
+        assert [names_by_id[id] for id in descendants][:3] == [
+            "Audio",
+            "Headphones",
+            "Wireless headphones",
+        ]
+        assert len(descendants) == 5
+
+        descendants = tree.descendants(categories["Audio"].id, max_depth=1)
+        assert {names_by_id[id] for id in descendants} == {"Audio", "Headphones"}
+
+        assert tree.descendants(999) == []
+
+    def test_ancestors(self, categories):
+        tree = CategoryTree()
+
+        assert tree.ancestors(categories["Wireless headphones"].id) == [
+            categories[name].id
+            for name in ["Tech", "Audio", "Headphones", "Wireless headphones"]
+        ]
+        assert tree.ancestors(categories["Books"].id) == [categories["Books"].id]
+
+    def test_insert(self, categories):
+        tree = CategoryTree()
+
+        novels = Category.objects.create(name="Novels", parent=categories["Books"])
+        tree.insert(novels)
+
+        _assert_same_tree(tree, CategoryTree())
+        assert tree.depth(novels.id) == 1
+
+    def test_insert_unknown_parent(self, categories):
+        tree = CategoryTree()
+
+        with pytest.raises(KeyError):
+            tree.insert(Category(id=1000, name="Orphan", parent_id=999))
+
+    def test_reparent(self, categories):
+        tree = CategoryTree()
+
+        audio = categories["Audio"]
+        audio.parent = categories["Books"]
+        audio.save()
+        tree.reparent(audio)
+
+        _assert_same_tree(tree, CategoryTree())
+        assert tree.depth(categories["Wireless headphones"].id) == 3
+
+    def test_delete_promotes_children(self, categories):
+        tree = CategoryTree()
+
+        headphones = categories["Headphones"]
+        headphones_id = headphones.id
+        Category.objects.filter(parent=headphones).update(parent=headphones.parent)
+        headphones.delete()
+        tree.delete(headphones_id)
+
+        assert headphones_id not in tree
+        _assert_same_tree(tree, CategoryTree())
+        assert tree.depth(categories["Wireless headphones"].id) == 2
+
+    def test_delete_category_whose_parent_is_last(self, categories):
+        tree = CategoryTree()
+
+        hardware = Category.objects.create(name="Hardware", parent=categories["Tech"])
+        tree.insert(hardware)
+        computers = categories["Computers"]
+        computers.parent = hardware
+        computers.save()
+        tree.reparent(computers)
+
+        computers_id = computers.id
+        Category.objects.filter(parent=computers).update(parent=hardware)
+        computers.delete()
+        tree.delete(computers_id)
+
+        _assert_same_tree(tree, CategoryTree())
+        assert set(tree.children(hardware.id)) == {
+            categories["Laptops"].id,
+            categories["Desktops"].id,
+        }
+
+    def test_delete_subtree(self, categories):
+        tree = CategoryTree()
+
+        audio_id = categories["Audio"].id
+        tree.delete_subtree(audio_id)
+
+        assert len(tree) == len(categories) - 5
+        assert audio_id not in tree
+        assert categories["In-ear wireless headphones"].id not in tree
+        assert tree.children(categories["Tech"].id) == [categories["Computers"].id]
+        assert tree.is_descendant(categories["Laptops"].id, categories["Tech"].id)
+
+    def test_delete_many_promotes_children(self, categories):
+        tree = CategoryTree()
+
+        deleted = [categories[name] for name in ("Computers", "Audio", "Headphones")]
+        # All three are in the subtree of Tech, so their children are all moved to Tech.
+        Category.objects.filter(parent__in=deleted).update(parent=categories["Tech"])
+        Category.objects.filter(pk__in=[c.id for c in deleted]).delete()
+        tree.delete_many(c.id for c in deleted)
+
+        _assert_same_tree(tree, CategoryTree())
+        assert tree.depth(categories["Wireless headphones"].id) == 1
+
+    def test_delete_unknown(self, categories):
+        tree = CategoryTree()
+
+        with pytest.raises(KeyError):
+            tree.delete(999)
+
+    def test_pickle(self, categories):
+        tree = CategoryTree()
+
+        unpickled = pickle.loads(pickle.dumps(tree, pickle.HIGHEST_PROTOCOL))
+
+        _assert_same_tree(unpickled, tree)
+        assert unpickled.is_descendant(
+            categories["Laptops"].id, categories["Tech"].id, max_depth=2
+        )
+
+
+class TestCategoryTreeFromParentIds:
+    def test_deep_chain(self):
+        n = 200_000
+        tree = CategoryTree((id, id - 1 if id > 1 else None) for id in range(1, n + 1))
+
+        assert tree.depth(n) == n - 1
+        assert tree.is_descendant(n, 1)
+        assert not tree.is_descendant(1, n)
+        assert len(tree.descendants(n - 9)) == 10
+
+        tree.delete(n // 2)
+        assert tree.depth(n) == n - 2
+
+    def test_cycle(self):
+        with pytest.raises(ValueError, match="cyclic"):
+            CategoryTree([(1, None), (2, 4), (3, 2), (4, 3), (5, 4)])
+
+
+def _assert_same_tree(tree: CategoryTree, expected: CategoryTree) -> None:
+    assert len(tree) == len(expected)
+    for id in Category.objects.values_list("id", flat=True):
+        assert tree.parent_id(id) == expected.parent_id(id)
+        assert tree.depth(id) == expected.depth(id)
+        assert set(tree.children(id)) == set(expected.children(id))
+        assert set(tree.descendants(id)) == set(expected.descendants(id))
@@ -1,3 +1,5 @@
+import random
+
 import pytest
 from categories_app.models import Category
 from categories_app.lib.similarity_graph import SimilarityGraph
@@ -34,6 +36,97 @@ class TestSimilarityGraph:
         assert total_nodes == len(categories)
 
 
+class TestSimilarityGraphFromSimilarities:
+    def test_csr_adjacency(self):
+        # A path 1-2-3-4, a triangle 5-6-7 and an isolated vertex 8.
+        pairs = [(1, 2), (2, 3), (3, 4), (5, 6), (6, 7), (7, 5)]
+        graph = SimilarityGraph(
+            range(1, 9), [edge for a, b in pairs for edge in ((a, b), (b, a))]
+        )
+
+        assert graph.compute_longest_rabbit_hole() in ([1, 2, 3, 4], [4, 3, 2, 1])
+        assert sorted(map(sorted, graph.compute_rabbit_islands())) == [
+            [1, 2, 3, 4],
+            [5, 6, 7],
+            [8],
+        ]
+
+    @pytest.mark.parametrize("seed", range(100))
+    def test_longest_rabbit_hole_same_as_bfs_from_every_category(self, seed):
+        rng = random.Random(seed)
+        n = rng.randint(2, 60)
+        pairs = {
+            tuple(sorted(rng.sample(range(n), 2))) for _ in range(rng.randint(1, 2 * n))
+        }
+        graph = SimilarityGraph(
+            range(n), [edge for a, b in sorted(pairs) for edge in ((a, b), (b, a))]
+        )
+
+        assert (
+            graph.compute_longest_rabbit_hole()
+            == _longest_path_by_bfs_from_every_category(graph)
+        )
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_longest_rabbit_hole_same_with_workers(self, seed):
+        rng = random.Random(seed)
+        n = 200
+        pairs = {tuple(sorted(rng.sample(range(n), 2))) for _ in range(n)}
+        graph = SimilarityGraph(
+            range(n), [edge for a, b in sorted(pairs) for edge in ((a, b), (b, a))]
+        )
+
+        assert graph.compute_longest_rabbit_hole(
+            workers=3
+        ) == graph.compute_longest_rabbit_hole(workers=1)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_estimated_length_bounds_longest_rabbit_hole(self, seed):
+        rng = random.Random(seed)
+        n = rng.randint(2, 60)
+        pairs = {
+            tuple(sorted(rng.sample(range(n), 2))) for _ in range(rng.randint(1, 2 * n))
+        }
+        graph = SimilarityGraph(
+            range(n), [edge for a, b in sorted(pairs) for edge in ((a, b), (b, a))]
+        )
+        length = len(graph.compute_longest_rabbit_hole()) - 1
+
+        lower, upper = graph.estimate_longest_rabbit_hole_length(sweeps=1)
+
+        assert lower <= length <= upper
+
+    def test_estimated_length_exact_for_path(self):
+        graph = SimilarityGraph(
+            range(10), [edge for i in range(9) for edge in ((i, i + 1), (i + 1, i))]
+        )
+
+        assert graph.estimate_longest_rabbit_hole_length(time_budget=0) == (9, 9)
+
+    def test_no_similarities(self):
+        graph = SimilarityGraph([1, 2], [])
+
+        assert graph.compute_longest_rabbit_hole() == []
+        assert graph.estimate_longest_rabbit_hole_length() == (0, 0)
+        assert graph.compute_rabbit_islands() == [{1}, {2}]
+
+
+def _longest_path_by_bfs_from_every_category(graph: SimilarityGraph) -> list[int]:
+    """
+    The algorithm before iFUB: the first longest path found by BFS from every category,
+    scanning the categories reached in BFS order.
+    """
+    max_dist = 0
+    longest_path: list[int] = []
+    for start in range(len(graph._ids)):
+        distances, parents, order = graph._bfs(start)
+        for i in order:
+            if distances[i] > max_dist:
+                max_dist = distances[i]
+                longest_path = graph._get_path(i, parents)
+    return longest_path
+
+
 def _categories_by_id(categories: dict[str, Category], category_id) -> Category:
     for name, category in categories.items():
         if category.id == category_id:
@@ -0,0 +1,41 @@
+import pytest
+from categories_app.models import Category
+
+
+@pytest.mark.django_db
+class TestCategoryPath:
+    def test_path_on_create(self, categories):
+        wireless = Category.objects.get(id=categories["Wireless headphones"].id)
+        assert (
+            wireless.path
+            == "/".join(
+                str(categories[name].id)
+                for name in ["Tech", "Audio", "Headphones", "Wireless headphones"]
+            )
+            + "/"
+        )
+        assert wireless.depth == 3
+
+    def test_reparent_rebases_subtree(self, categories):
+        audio = categories["Audio"]
+        audio.parent = categories["Books"]
+        audio.save()
+
+        in_ear = Category.objects.get(id=categories["In-ear wireless headphones"].id)
+        assert in_ear.path.startswith(f"{categories['Books'].id}/{audio.id}/")
+        assert in_ear.depth == 4
+
+    def test_subtree(self, categories):
+        computers = Category.objects.get(id=categories["Computers"].id)
+
+        names = set(
+            Category.objects.subtree(computers.path).values_list("name", flat=True)
+        )
+        assert names == {"Computers", "Laptops", "Desktops"}
+
+        names = set(
+            Category.objects.subtree(computers.path, max_depth=0).values_list(
+                "name", flat=True
+            )
+        )
+        assert names == {"Computers"}